@@ -0,0 +1,132 @@
+import gzip
+import json
+import logging
+import os
+import shutil
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Large per-document outputs (page texts, raw Document AI JSON) kept out of the job store.
+# Artifacts are content-addressed by the PDF's sha256 and stored gzip-compressed, so identical
+# uploads share them and the compressed bytes can be served as-is with Content-Encoding: gzip.
+ARTIFACT_TTL_SECONDS = float(os.getenv("ARTIFACT_TTL_SECONDS", str(7 * 24 * 3600)))
+ARTIFACT_COMPRESSION_LEVEL = int(os.getenv("ARTIFACT_COMPRESSION_LEVEL", "6"))
+
+PAGES = "pages.json.gz"
+DOCUMENT = "document.json.gz"
+
+
+class ArtifactStore:
+    # All methods are blocking; call them through run_blocking
+    def put(self, digest: str, name: str, data: bytes) -> None:
+        raise NotImplementedError
+
+    def get(self, digest: str, name: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def exists(self, digest: str, name: str) -> bool:
+        raise NotImplementedError
+
+    def evict_expired(self) -> int:
+        return 0
+
+    # JSON helpers: values are stored as gzip-compressed UTF-8 JSON
+    def put_json(self, digest: str, name: str, value) -> None:
+        self.put_json_text(digest, name, json.dumps(value))
+
+    def put_json_text(self, digest: str, name: str, text: str) -> None:
+        self.put(digest, name, gzip.compress(text.encode("utf-8"), compresslevel=ARTIFACT_COMPRESSION_LEVEL))
+
+    def get_json(self, digest: str, name: str):
+        data = self.get(digest, name)
+        return json.loads(gzip.decompress(data)) if data is not None else None
+
+
+class NullArtifactStore(ArtifactStore):
+    def put(self, digest: str, name: str, data: bytes) -> None:
+        pass
+
+    def get(self, digest: str, name: str) -> Optional[bytes]:
+        return None
+
+    def exists(self, digest: str, name: str) -> bool:
+        return False
+
+
+class LocalArtifactStore(ArtifactStore):
+    def __init__(self, root: str, ttl_seconds: float):
+        self.root = root
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, digest: str, name: str) -> str:
+        return os.path.join(self.root, digest[:2], digest, name)
+
+    def put(self, digest: str, name: str, data: bytes) -> None:
+        path = self._path(digest, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)  # atomic, so readers never see a partial file
+
+    def get(self, digest: str, name: str) -> Optional[bytes]:
+        try:
+            with open(self._path(digest, name), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def exists(self, digest: str, name: str) -> bool:
+        return os.path.exists(self._path(digest, name))
+
+    # Remove artifact directories not written to within the TTL
+    def evict_expired(self) -> int:
+        cutoff = time.time() - self.ttl_seconds
+        evicted = 0
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.is_dir() and entry.stat().st_mtime < cutoff:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                    evicted += 1
+        return evicted
+
+
+# Expiry of GCS artifacts is left to a bucket lifecycle rule on the prefix
+class GCSArtifactStore(ArtifactStore):
+    def __init__(self, bucket, prefix: str):
+        self.bucket = bucket
+        self.prefix = prefix.rstrip("/")
+
+    def _blob(self, digest: str, name: str):
+        return self.bucket.blob(f"{self.prefix}/{digest}/{name}")
+
+    def put(self, digest: str, name: str, data: bytes) -> None:
+        self._blob(digest, name).upload_from_string(data, content_type="application/gzip")
+
+    def get(self, digest: str, name: str) -> Optional[bytes]:
+        from google.api_core.exceptions import NotFound
+        try:
+            return self._blob(digest, name).download_as_bytes()
+        except NotFound:
+            return None
+
+    def exists(self, digest: str, name: str) -> bool:
+        return self._blob(digest, name).exists()
+
+
+# Build the store from ARTIFACT_STORE_* environment variables; `bucket` is used for the gcs backend
+def build_artifact_store(bucket=None) -> ArtifactStore:
+    kind = os.getenv("ARTIFACT_STORE_BACKEND", "local").lower()
+    if kind == "gcs" and bucket is not None:
+        store = GCSArtifactStore(bucket, os.getenv("ARTIFACT_STORE_PREFIX", "artifacts"))
+    elif kind == "none":
+        store = NullArtifactStore()
+    else:
+        store = LocalArtifactStore(os.getenv("ARTIFACT_STORE_PATH", "cache/artifacts"), ARTIFACT_TTL_SECONDS)
+    logger.info(f"[ARTIFACTS] Artifact store backend: {type(store).__name__}")
+    return store
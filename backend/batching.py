@@ -0,0 +1,100 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Micro-batching: requests that arrive within a short window (or until the batch is full) are
+# handed to one batch call. At most max_in_flight batches run at once; while all are busy, new
+# requests keep accumulating and go out together when one finishes, so batches grow with load.
+# Each caller awaits its own future, which the batch function resolves as soon as that item's
+# result is ready, so callers do not wait for the slowest item.
+Resolve = Callable[[int, Any], None]  # (index in batch, result or Exception)
+BatchFunction = Callable[[List[Any], Resolve], Awaitable[None]]
+
+
+class BatchCoalescer:
+    def __init__(self, name: str, process_batch: BatchFunction, max_batch_size: int, max_wait_seconds: float,
+                 max_in_flight: int):
+        self.name = name
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self.max_in_flight = max_in_flight
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    # Add an item to the next batch and wait for its result. Cancelling the caller only
+    # withdraws this item; the batch itself is cancelled once every one of its callers is gone.
+    async def submit(self, item: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_seconds, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._pending = [(item, future) for item, future in self._pending if not future.done()]
+        # Start batches while there is capacity; anything left waits for a running batch to finish
+        while self._pending and len(self._tasks) < self.max_in_flight:
+            batch, self._pending = self._pending[:self.max_batch_size], self._pending[self.max_batch_size:]
+            task = asyncio.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._batch_done)
+
+    def _batch_done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if self._pending and self._timer is None:
+            self._flush()
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        futures = [future for _, future in batch]
+        task = asyncio.current_task()
+
+        def abandon_if_unwanted(_: asyncio.Future) -> None:
+            if all(future.cancelled() for future in futures) and not task.done():
+                logger.info(f"[BATCH] {self.name}: all callers cancelled, abandoning batch of {len(futures)}")
+                task.cancel()
+
+        for future in futures:
+            future.add_done_callback(abandon_if_unwanted)
+
+        def resolve(index: int, result: Any) -> None:
+            future = futures[index]
+            if future.done():
+                return
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+        logger.info(f"[BATCH] {self.name}: submitting batch of {len(batch)}")
+        try:
+            await self.process_batch([item for item, _ in batch], resolve)
+        except asyncio.CancelledError:
+            for future in futures:
+                future.cancel()
+            raise
+        except Exception as e:
+            for index in range(len(futures)):
+                resolve(index, e)
+        for index in range(len(futures)):
+            resolve(index, RuntimeError(f"{self.name}: no result for batch item"))
+
+    async def stop(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for _, future in self._pending:
+            future.cancel()
+        self._pending = []
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
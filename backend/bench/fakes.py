@@ -0,0 +1,379 @@
+# Local stand-ins for GCS, Document AI, Groq, Firebase Auth and Tavily, with configurable
+# latency and error injection. install_fakes() must run before `main` is imported, because
+# main builds its cloud clients at import time.
+import contextlib
+import datetime
+import hashlib
+import io
+import json
+import random
+import threading
+import time
+import types
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+import httpx
+from google.api_core.exceptions import NotFound, ServiceUnavailable
+
+import token_auth
+
+
+@dataclass
+class FakeConfig:
+    gcs_latency: float = 0.05
+    docai_latency: float = 2.0
+    docai_page_latency: float = 0.02  # extra batch time per page of the largest document
+    docai_batch_slots: int = 5  # concurrent batch operations per project (quota); extra ones wait
+    groq_latency: float = 1.0
+    tavily_latency: float = 0.5
+    error_rate: float = 0.0
+    jitter: float = 0.2
+    seed: int = 0
+    calls: Dict[str, int] = field(default_factory=dict)
+
+    def __post_init__(self):
+        self._rng = random.Random(self.seed)
+        self._lock = threading.Lock()
+
+    # Sleep for a jittered latency and maybe fail; counts every call per provider
+    def hit(self, provider: str, latency: float) -> bool:
+        with self._lock:
+            self.calls[provider] = self.calls.get(provider, 0) + 1
+            delay = latency * self._rng.uniform(1 - self.jitter, 1 + self.jitter)
+            failed = self._rng.random() < self.error_rate
+        time.sleep(delay)
+        return failed
+
+
+# --- GCS ---
+
+class FakeBlob:
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        self.chunk_size = None
+
+    def upload_from_string(self, data, content_type=None, **kwargs):
+        if self.bucket.config.hit("gcs", self.bucket.config.gcs_latency):
+            raise ServiceUnavailable("fake gcs outage")
+        self.bucket.objects[self.name] = bytes(data)
+        self.bucket.created[self.name] = datetime.datetime.now(datetime.timezone.utc)
+
+    def upload_from_file(self, file_obj, content_type=None, rewind=False, **kwargs):
+        if rewind:
+            file_obj.seek(0)
+        self.upload_from_string(file_obj.read(), content_type=content_type)
+
+    def upload_from_filename(self, filename, content_type=None, **kwargs):
+        with open(filename, "rb") as f:
+            self.upload_from_string(f.read(), content_type=content_type)
+
+    def download_as_bytes(self, **kwargs):
+        self.bucket.config.hit("gcs", self.bucket.config.gcs_latency)
+        if self.name not in self.bucket.objects:
+            raise NotFound(self.name)
+        return self.bucket.objects[self.name]
+
+    def exists(self, **kwargs):
+        self.bucket.config.hit("gcs", self.bucket.config.gcs_latency)
+        return self.name in self.bucket.objects
+
+    @property
+    def time_created(self):
+        return self.bucket.created.get(self.name)
+
+    def delete(self, **kwargs):
+        self.bucket.config.hit("gcs", self.bucket.config.gcs_latency)
+        self.bucket.delete_blob(self.name)
+
+
+class FakeBucket:
+    def __init__(self, name, config):
+        self.name = name
+        self.config = config
+        self.objects: Dict[str, bytes] = {}
+        self.created: Dict[str, datetime.datetime] = {}
+
+    def blob(self, name):
+        return FakeBlob(self, name)
+
+    # Inside FakeStorageClient.batch() deletes are free and missing objects are ignored
+    def delete_blob(self, name, **kwargs):
+        self.created.pop(name, None)
+        if self.objects.pop(name, None) is None and not getattr(FakeStorageClient.batching, "active", False):
+            raise NotFound(name)
+
+
+class FakeStorageClient:
+    buckets: Dict[str, FakeBucket] = {}
+    batching = threading.local()  # inside batch() on this thread
+    config = FakeConfig()
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def bucket(self, name):
+        if name not in self.buckets:
+            self.buckets[name] = FakeBucket(name, self.config)
+        return self.buckets[name]
+
+    def list_blobs(self, bucket_name, prefix="", max_results=None, **kwargs):
+        self.config.hit("gcs", self.config.gcs_latency)
+        bucket = self.bucket(bucket_name)
+        return [FakeBlob(bucket, name) for name in sorted(bucket.objects) if name.startswith(prefix)][:max_results]
+
+    # A batch request costs one round trip
+    @contextlib.contextmanager
+    def batch(self, raise_exception=True):
+        self.config.hit("gcs_batch", self.config.gcs_latency)
+        FakeStorageClient.batching.active = True
+        try:
+            yield
+        finally:
+            FakeStorageClient.batching.active = False
+
+
+# --- Document AI ---
+
+def _fake_document(documentai, content: bytes):
+    from pypdf import PdfReader
+    page_count = len(PdfReader(io.BytesIO(content)).pages)
+    text, pages = "", []
+    for i in range(page_count):
+        start = len(text)
+        text += f"ocr text for page {i} " + hashlib.sha1(content[:64] + bytes([i % 256])).hexdigest() + "\n"
+        segment = documentai.Document.TextAnchor.TextSegment(start_index=start, end_index=len(text))
+        layout = documentai.Document.Page.Layout(text_anchor=documentai.Document.TextAnchor(text_segments=[segment]))
+        pages.append(documentai.Document.Page(page_number=i + 1, layout=layout))
+    return documentai.Document(text=text, pages=pages)
+
+
+class FakeOperation:
+    def __init__(self, client, request, finish_at):
+        self._client = client
+        self._request = request
+        self._finish_at = finish_at
+        self._cancelled = False
+        self._metadata = None
+        self.operation = types.SimpleNamespace(name=f"operations/fake-{id(self)}")
+
+    def _finish(self):
+        documentai, config = self._client.documentai, self._client.config
+        State = documentai.BatchProcessMetadata.State
+        failed = config.hit("document_ai", 0)
+        statuses = []
+        output_root = self._request.document_output_config.gcs_output_config.gcs_uri
+        for index, document in enumerate(self._request.input_documents.gcs_documents.documents):
+            bucket_name, _, name = document.gcs_uri[len("gs://"):].partition("/")
+            bucket = FakeStorageClient().bucket(bucket_name)
+            output = f"{output_root.rstrip('/')}/{index}"
+            output_name = output[len(f"gs://{bucket_name}/"):]
+            content = bucket.objects.get(name)
+            if content is not None:
+                bucket.objects[f"{output_name}/doc-0.json"] = documentai.Document.to_json(
+                    _fake_document(documentai, content)
+                ).encode("utf-8")
+            statuses.append(documentai.BatchProcessMetadata.IndividualProcessStatus(
+                input_gcs_source=document.gcs_uri, output_gcs_destination=output
+            ))
+        self._metadata = documentai.BatchProcessMetadata(
+            state=State.FAILED if failed or self._cancelled else State.SUCCEEDED,
+            state_message="fake failure" if failed else "",
+            individual_process_statuses=statuses,
+        )
+
+    def done(self, **kwargs):
+        if self._metadata is None and (self._cancelled or time.monotonic() >= self._finish_at):
+            self._finish()
+        return self._metadata is not None
+
+    def result(self, timeout=None, **kwargs):
+        deadline = time.monotonic() + (timeout or 1e9)
+        while not self.done():
+            if time.monotonic() > deadline:
+                raise TimeoutError("fake operation timed out")
+            time.sleep(0.01)
+        return None
+
+    def cancel(self):
+        self._client.config.hit("document_ai_cancel", 0)
+        self._cancelled = True
+        return True
+
+    def cancelled(self):
+        return self._cancelled
+
+    @property
+    def metadata(self):
+        return self._metadata
+
+
+class FakeDocumentAIClient:
+    config = FakeConfig()
+    documentai = None
+    _slots_free_at: List[float] = []
+    _lock = threading.Lock()
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    # Batch operations occupy one of docai_batch_slots; each costs a fixed overhead plus per-page
+    # time, with the documents of one batch processed in parallel
+    def _schedule(self, request) -> float:
+        pages = 0
+        bucket_cache = FakeStorageClient()
+        for document in request.input_documents.gcs_documents.documents:
+            bucket_name, _, name = document.gcs_uri[len("gs://"):].partition("/")
+            content = bucket_cache.bucket(bucket_name).objects.get(name)
+            if content is not None:
+                from pypdf import PdfReader
+                pages = max(pages, len(PdfReader(io.BytesIO(content)).pages))
+        duration = self.config.docai_latency + pages * self.config.docai_page_latency
+        with self._lock:
+            slots = self._slots_free_at
+            while len(slots) < self.config.docai_batch_slots:
+                slots.append(0.0)
+            slot = min(range(len(slots)), key=slots.__getitem__)
+            finish_at = max(time.monotonic(), slots[slot]) + duration
+            slots[slot] = finish_at
+        return finish_at
+
+    def processor_path(self, project, location, processor):
+        return f"projects/{project}/locations/{location}/processors/{processor}"
+
+    def process_document(self, request=None, **kwargs):
+        if self.config.hit("document_ai", self.config.docai_latency):
+            raise ServiceUnavailable("fake document ai outage")
+        document = _fake_document(self.documentai, request.raw_document.content)
+        return self.documentai.ProcessResponse(document=document)
+
+    def batch_process_documents(self, request=None, **kwargs):
+        self.config.hit("document_ai_submit", self.config.gcs_latency)
+        return FakeOperation(self, request, self._schedule(request))
+
+
+# --- Groq ---
+
+# Users study overlapping subjects: topics are drawn from a shared pool, with keywords in a
+# varying order and sometimes one extra keyword, so queries repeat or nearly repeat across uploads
+TOPIC_POOL = [
+    (f"{subject} {aspect}", [subject.lower(), aspect.lower(), hint])
+    for subject, hint in (
+        ("Neural Networks", "deep learning"), ("Linear Algebra", "matrices"), ("Probability", "statistics"),
+        ("Graph Algorithms", "traversal"), ("Compilers", "parsing"), ("Operating Systems", "scheduling"),
+        ("Databases", "indexing"), ("Calculus", "derivatives"), ("Cryptography", "encryption"),
+        ("Distributed Systems", "consensus"),
+    )
+    for aspect in ("Fundamentals", "Applications", "Advanced Topics")
+]
+
+GROQ_FIRST_TOKEN_SHARE = 0.2
+
+
+class FakeGroq:
+    config = FakeConfig()
+
+    def __init__(self, *args, **kwargs):
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=self._create))
+
+    # Streaming replies take the same total time, with the first chunk after GROQ_FIRST_TOKEN_SHARE
+    # of it and the rest spread evenly over the remaining chunks
+    def _create(self, messages=None, stream=False, **kwargs):
+        import groq
+        latency = self.config.groq_latency * (GROQ_FIRST_TOKEN_SHARE if stream else 1)
+        if self.config.hit("groq", latency):
+            raise groq.APIConnectionError(request=httpx.Request("POST", "https://api.groq.com/fake"))
+        prompt = messages[-1]["content"]
+        rng = random.Random(hashlib.sha1(prompt.encode("utf-8")).hexdigest())
+        topics = []
+        for name, keywords in rng.sample(TOPIC_POOL, 5):
+            keywords = rng.sample(keywords, len(keywords))
+            if rng.random() < 0.3:
+                keywords.append(rng.choice(("tutorial", "introduction", "course")))
+            topics.append({"name": name, "description": "Synthetic topic", "keywords": keywords})
+        content = "```json\n" + json.dumps({"topics": topics}) + "\n```"
+        if not stream:
+            message = types.SimpleNamespace(content=content)
+            return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+        return self._stream(content)
+
+    def _stream(self, content: str, step: int = 16):
+        pieces = [content[i:i + step] for i in range(0, len(content), step)]
+        delay = self.config.groq_latency * (1 - GROQ_FIRST_TOKEN_SHARE) / len(pieces)
+        for i, piece in enumerate(pieces):
+            if i:
+                time.sleep(delay)
+            yield types.SimpleNamespace(choices=[types.SimpleNamespace(delta=types.SimpleNamespace(content=piece))])
+
+
+# --- Tavily (real local HTTP server) ---
+
+class TavilyStubServer:
+    def __init__(self, config: FakeConfig, host: str = "127.0.0.1", port: int = 0):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                query = json.loads(body or b"{}").get("query", "")
+                if stub.config.hit("tavily", stub.config.tavily_latency):
+                    payload, status = b'{"detail": "fake outage"}', 503
+                else:
+                    slug = hashlib.sha1(query.encode("utf-8")).hexdigest()[:10]
+                    results = [
+                        {"url": f"https://medium.com/{slug}/{i}", "title": f"{query} #{i}", "content": "", "score": 0.95 - 0.1 * i}
+                        for i in range(3)
+                    ]
+                    payload, status = json.dumps({"results": results}).encode("utf-8"), 200
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.config = config
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/search"
+
+    def start(self) -> "TavilyStubServer":
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+
+
+# Real verifier (verified-token cache included) minus the signature and claims check
+class FakeTokenVerifier(token_auth.FirebaseTokenVerifier):
+    def decode(self, token: str) -> dict:
+        return {"sub": token, "exp": time.time() + 3600}
+
+
+# Patch the SDK entry points main.py uses. Tokens are accepted as-is: the uid is the token.
+def install_fakes(config: FakeConfig) -> None:
+    import groq
+    from google.cloud import documentai_v1, storage
+
+    FakeStorageClient.config = config
+    FakeDocumentAIClient.config = config
+    FakeDocumentAIClient.documentai = documentai_v1
+    FakeGroq.config = config
+
+    storage.Client = FakeStorageClient
+    documentai_v1.DocumentProcessorServiceClient = FakeDocumentAIClient
+    groq.Groq = FakeGroq
+    # Only the verifier main.py builds is replaced; FirebaseTokenVerifier itself stays intact for its tests
+    token_auth.build_token_verifier = lambda project_id: FakeTokenVerifier(project_id, token_auth.PublicKeyCache())
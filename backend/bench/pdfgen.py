@@ -0,0 +1,51 @@
+# Synthetic PDFs for the benchmarks: born-digital pages carry a text layer, "scanned"
+# pages are empty so the pipeline has to send them to (fake) Document AI.
+import random
+
+WORDS = (
+    "gradient descent neural network backpropagation entropy regression bayes markov chain kernel "
+    "matrix eigenvalue vector calculus integral derivative probability variance sampling inference "
+    "compiler parser grammar automaton graph traversal dynamic programming recursion complexity"
+).split()
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def page_text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def make_pdf(pages) -> bytes:
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>"]
+    kids = " ".join(f"{3 + 2 * i} 0 R" for i in range(len(pages)))
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>")
+    font_id = 3 + 2 * len(pages)
+    for i, text in enumerate(pages):
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + 2 * i} 0 R "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> >>"
+        )
+        stream = f"BT /F1 10 Tf 40 750 Td ({_escape(text)}) Tj ET" if text else ""
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = "%PDF-1.4\n"
+    offsets = []
+    for i, body in enumerate(objects):
+        offsets.append(len(out))
+        out += f"{i + 1} 0 obj\n{body}\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n"
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    return out.encode("latin-1")
+
+
+# A document with `pages` pages, of which `scanned` (chosen at random) have no text layer
+def make_document(seed: int, pages: int, scanned: int, words_per_page: int = 300) -> bytes:
+    rng = random.Random(seed)
+    scanned_pages = set(rng.sample(range(pages), min(scanned, pages)))
+    texts = [None if i in scanned_pages else f"doc {seed} page {i} " + page_text(rng, words_per_page) for i in range(pages)]
+    return make_pdf(texts)
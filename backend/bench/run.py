@@ -0,0 +1,164 @@
+# End-to-end benchmark of the FastAPI app against local fakes (no cloud credentials needed).
+#
+#   cd backend && python -m bench.run --uploads 40 --concurrency 8 --pages 30 --scanned 5
+#
+# Uploads synthetic PDFs through /api/analyze-pdf, polls /api/analyze-pdf-status until each
+# job finishes, and reports p50/p95/p99 for every pipeline stage, every external provider,
+# the status poll itself and the end-to-end latency (upload -> done). Provider latencies and
+# the error rate are injected by bench.fakes; see --help.
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.fakes import FakeConfig, TavilyStubServer, install_fakes  # noqa: E402
+from bench.pdfgen import make_document  # noqa: E402
+from bench.stats import summarize  # noqa: E402
+
+FINISHED = ("done", "failed", "cancelled", "not_found")
+
+
+# Record raw observations next to the Prometheus histograms so we can report exact percentiles
+def capture(histogram, label, samples, prefix):
+    observe = histogram.observe
+
+    def wrapper(value, **labels):
+        samples[f"{prefix}.{labels[label]}"].append(value)
+        observe(value, **labels)
+
+    histogram.observe = wrapper
+
+
+async def run_upload(client, index, args, samples, statuses):
+    uid = f"bench-user-{index % args.users}"
+    uuid = f"bench-{os.getpid()}-{index}"
+    seed = index % args.distinct if args.distinct else index
+    content = make_document(seed, args.pages, args.scanned)
+    started = time.perf_counter()
+    while True:
+        response = await client.post(
+            "/api/analyze-pdf",
+            files={"file": (f"doc-{seed}.pdf", content, "application/pdf")},
+            data={"uuid": uuid},
+            headers={"x-firebase-token": uid},
+        )
+        if response.status_code != 429:
+            break
+        statuses["rejected_429"] += 1
+        await asyncio.sleep(min(float(response.headers.get("Retry-After", "1")), args.max_retry_wait))
+    samples["endpoint.upload_response"].append(time.perf_counter() - started)
+    if response.status_code != 200:
+        statuses[f"http_{response.status_code}"] += 1
+        return
+
+    while True:
+        poll_started = time.perf_counter()
+        response = await client.get(f"/api/analyze-pdf-status/{uuid}", headers={"x-firebase-token": uid})
+        samples["endpoint.status_poll"].append(time.perf_counter() - poll_started)
+        if response.status_code != 200:
+            statuses[f"status_http_{response.status_code}"] += 1
+            return
+        status = response.json()
+        if status.get("status") in FINISHED:
+            break
+        await asyncio.sleep(args.poll_interval)
+    samples["end_to_end"].append(time.perf_counter() - started)
+    statuses[status.get("status")] += 1
+
+
+async def drive(args, samples, statuses):
+    import httpx
+    import main
+    from metrics import EXTERNAL_CALL_SECONDS, PIPELINE_STAGE_SECONDS
+
+    logging.getLogger().setLevel(getattr(logging, args.log_level))
+    capture(PIPELINE_STAGE_SECONDS, "stage", samples, "stage")
+    capture(EXTERNAL_CALL_SECONDS, "provider", samples, "external")
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def bounded(client, index):
+        async with semaphore:
+            await run_upload(client, index, args, samples, statuses)
+
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(bounded(client, i) for i in range(args.uploads)))
+            return time.perf_counter() - started
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark /api/analyze-pdf against local fakes")
+    parser.add_argument("--uploads", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=5, help="uploads in flight at once")
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--scanned", type=int, default=3, help="pages without a text layer (need OCR)")
+    parser.add_argument("--distinct", type=int, default=0, help="reuse this many distinct PDFs (0 = all unique)")
+    parser.add_argument("--gcs-latency", type=float, default=0.05)
+    parser.add_argument("--docai-latency", type=float, default=2.0)
+    parser.add_argument("--groq-latency", type=float, default=1.0)
+    parser.add_argument("--tavily-latency", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="probability each fake call fails")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument("--max-retry-wait", type=float, default=2.0)
+    parser.add_argument("--cache", action="store_true", help="keep the result and search caches enabled (default: disabled)")
+    parser.add_argument("--rate-limits", action="store_true", help="apply the default provider rate limits (default: unlimited)")
+    parser.add_argument("--log-level", default="WARNING", choices=("DEBUG", "INFO", "WARNING", "ERROR"))
+    args = parser.parse_args()
+
+    config = FakeConfig(
+        gcs_latency=args.gcs_latency,
+        docai_latency=args.docai_latency,
+        groq_latency=args.groq_latency,
+        tavily_latency=args.tavily_latency,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    tavily = TavilyStubServer(config).start()
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    os.environ.update({
+        "GOOGLE_CLOUD_PROJECT": "bench-project",
+        "DOCUMENT_AI_PROCESSOR_ID": "bench-processor",
+        "GCS_BUCKET_NAME": "bench-bucket",
+        "GROQ_API_KEY": "bench",
+        "TAVILY_API_KEY": "bench",
+        "TAVILY_API_URL": tavily.url,
+        "JOB_STORE_BACKEND": "memory",
+        "RESULT_CACHE_BACKEND": "memory" if args.cache else "none",
+        "SEARCH_CACHE_MAX_ENTRIES": os.environ.get("SEARCH_CACHE_MAX_ENTRIES", "5000") if args.cache else "0",
+        "RESULT_CACHE_PATH": os.path.join(workdir, "results.sqlite3"),
+        "ARTIFACT_STORE_PATH": os.path.join(workdir, "artifacts"),
+    })
+    if not args.rate_limits:
+        for provider in ("GCS", "DOCUMENT_AI", "GROQ", "TAVILY"):
+            os.environ.setdefault(f"{provider}_RATE_LIMIT_PER_MINUTE", "0")
+    install_fakes(config)
+
+    samples = defaultdict(list)
+    statuses = Counter()
+    try:
+        elapsed = asyncio.run(drive(args, samples, statuses))
+    finally:
+        tavily.stop()
+
+    print(summarize(samples))
+    print()
+    print(f"uploads={args.uploads} concurrency={args.concurrency} pages={args.pages} scanned={args.scanned} "
+          f"error_rate={args.error_rate} cache={'on' if args.cache else 'off'}")
+    print(f"wall={elapsed:.2f}s throughput={args.uploads / elapsed:.2f} jobs/s")
+    print("outcomes: " + ", ".join(f"{name}={count}" for name, count in sorted(statuses.items())))
+    print("provider calls: " + ", ".join(f"{name}={count}" for name, count in sorted(config.calls.items())))
+
+
+if __name__ == "__main__":
+    main_cli()
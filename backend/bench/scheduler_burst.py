@@ -0,0 +1,118 @@
+# Synthetic burst against the pipeline scheduler with stubbed external services.
+#
+#   cd backend && python -m bench.scheduler_burst --jobs 200 --users 20 --workers 4
+#
+# Each job sleeps through stubbed upload/OCR/LLM/search latencies. Reports accepted/rejected
+# counts, throughput and p50/p95/p99 end-to-end latency (submit -> finished),
+# compared against the old unbounded "create_task per upload" behaviour.
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scheduler import JobScheduler, QueueFullError  # noqa: E402
+from bench.stats import percentile  # noqa: E402
+
+
+# Stubbed pipeline: fixed stage latencies plus a shared "provider quota" that fails jobs when too
+# many run at once, which is what the unbounded mode runs into in production.
+class StubPipeline:
+    def __init__(self, stage_seconds, quota):
+        self.stage_seconds = stage_seconds
+        self.quota = quota
+        self.in_flight = 0
+        self.failures = 0
+
+    async def run(self):
+        self.in_flight += 1
+        try:
+            for seconds in self.stage_seconds:
+                if self.in_flight > self.quota:
+                    self.failures += 1
+                    return False
+                await asyncio.sleep(seconds * random.uniform(0.8, 1.2))
+            return True
+        finally:
+            self.in_flight -= 1
+
+
+async def run_scheduled(args, pipeline):
+    scheduler = JobScheduler(args.workers, args.queue_size, args.per_user, expected_job_seconds=sum(args.stages))
+    scheduler.start()
+    latencies, rejected, done = [], 0, asyncio.Queue()
+    start = time.monotonic()
+    for i in range(args.jobs):
+        uid = f"user-{i % args.users}"
+        submitted = time.monotonic()
+
+        async def job(submitted=submitted):
+            ok = await pipeline.run()
+            await done.put((ok, time.monotonic() - submitted))
+        try:
+            scheduler.submit(uid, f"job-{i}", job)
+        except QueueFullError:
+            rejected += 1
+    accepted = args.jobs - rejected
+    for _ in range(accepted):
+        ok, latency = await done.get()
+        if ok:
+            latencies.append(latency)
+    elapsed = time.monotonic() - start
+    await scheduler.stop()
+    return latencies, rejected, elapsed
+
+
+async def run_unbounded(args, pipeline):
+    latencies = []
+    start = time.monotonic()
+
+    async def job():
+        submitted = time.monotonic()
+        ok = await pipeline.run()
+        if ok:
+            latencies.append(time.monotonic() - submitted)
+    await asyncio.gather(*(job() for _ in range(args.jobs)))
+    return latencies, 0, time.monotonic() - start
+
+
+def report(name, latencies, rejected, failures, elapsed):
+    print(f"{name}")
+    print(f"  succeeded={len(latencies)} failed={failures} rejected(429)={rejected} wall={elapsed:.2f}s")
+    print(f"  throughput={len(latencies) / elapsed:.2f} jobs/s")
+    if latencies:
+        print(
+            f"  latency p50={percentile(latencies, 50):.2f}s p95={percentile(latencies, 95):.2f}s "
+            f"p99={percentile(latencies, 99):.2f}s mean={statistics.mean(latencies):.2f}s"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic burst against the pipeline scheduler")
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queue-size", type=int, default=100)
+    parser.add_argument("--per-user", type=int, default=10)
+    parser.add_argument("--quota", type=int, default=8, help="concurrent jobs the stubbed providers accept")
+    parser.add_argument("--stages", type=float, nargs="+", default=[0.05, 0.3, 0.15, 0.1],
+                        help="stubbed upload/OCR/LLM/search latencies in seconds")
+    args = parser.parse_args()
+
+    random.seed(0)
+    pipeline = StubPipeline(args.stages, args.quota)
+    latencies, rejected, elapsed = asyncio.run(run_unbounded(args, pipeline))
+    report("unbounded create_task", latencies, rejected, pipeline.failures, elapsed)
+
+    random.seed(0)
+    pipeline = StubPipeline(args.stages, args.quota)
+    latencies, rejected, elapsed = asyncio.run(run_scheduled(args, pipeline))
+    report(f"scheduler workers={args.workers} queue={args.queue_size}", latencies, rejected, pipeline.failures, elapsed)
+
+
+if __name__ == "__main__":
+    main()
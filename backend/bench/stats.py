@@ -0,0 +1,23 @@
+import statistics
+from typing import Dict, List
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples: Dict[str, List[float]]) -> str:
+    rows = [f"{'metric':<32} {'count':>7} {'p50':>9} {'p95':>9} {'p99':>9} {'mean':>9}"]
+    for name in sorted(samples):
+        values = samples[name]
+        if not values:
+            continue
+        rows.append(
+            f"{name:<32} {len(values):>7} {percentile(values, 50):>9.3f} {percentile(values, 95):>9.3f} "
+            f"{percentile(values, 99):>9.3f} {statistics.mean(values):>9.3f}"
+        )
+    return "\n".join(rows)
@@ -0,0 +1,171 @@
+# Load test: status-poll latency while uploads are in flight, against local fakes.
+#
+#   cd backend && python -m bench.status_latency --uploads 20 --pages 10 --scanned 10
+#
+# Polls /api/analyze-pdf-status and /api/health at a fixed interval, first with nothing else
+# running (baseline) and then while N uploads go through the whole pipeline. Every blocking SDK
+# call in the fakes really sleeps, so any call left on the event loop shows up as poll latency
+# (health is timed from the same scheduled start, so it includes the status poll before it).
+# Exits with status 1 when the loaded p95 exceeds --max-ratio times the baseline p95 (plus
+# --slack-ms, so that sub-millisecond baselines do not make the check flaky). Job state goes to
+# the SQLite store by default, as in a multi-worker deployment, so store I/O left on the event
+# loop shows up too.
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.fakes import FakeConfig, TavilyStubServer, install_fakes  # noqa: E402
+from bench.pdfgen import make_document  # noqa: E402
+from bench.stats import percentile, summarize  # noqa: E402
+
+FINISHED = ("done", "failed", "cancelled", "not_found")
+PROBE_UID = "status-probe"
+PROBE_JOB = f"{PROBE_UID}-job"
+
+
+# Polls run on a fixed schedule and latency is measured from the scheduled time, so a blocked
+# event loop (which also delays the poller itself) counts against the polls it held up
+async def poll(client, samples, prefix, stop: asyncio.Event, interval: float):
+    loop = asyncio.get_running_loop()
+    scheduled = loop.time()
+    while not stop.is_set():
+        await client.get(f"/api/analyze-pdf-status/{PROBE_JOB}", headers={"x-firebase-token": PROBE_UID})
+        samples[f"{prefix}.status_poll"].append(loop.time() - scheduled)
+        await client.get("/api/health")
+        samples[f"{prefix}.health"].append(loop.time() - scheduled)
+        scheduled += interval
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=max(0.0, scheduled - loop.time()))
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_upload(client, index, args, statuses):
+    uid = f"load-user-{index % args.users}"
+    uuid = f"load-{os.getpid()}-{index}"
+    content = make_document(index, args.pages, args.scanned)
+    response = await client.post(
+        "/api/analyze-pdf",
+        files={"file": (f"doc-{index}.pdf", content, "application/pdf")},
+        data={"uuid": uuid},
+        headers={"x-firebase-token": uid},
+    )
+    if response.status_code != 200:
+        statuses[f"http_{response.status_code}"] += 1
+        return
+    while True:
+        await asyncio.sleep(args.job_poll_interval)
+        status = (await client.get(f"/api/analyze-pdf-status/{uuid}", headers={"x-firebase-token": uid})).json()
+        if status.get("status") in FINISHED:
+            statuses[status.get("status")] += 1
+            return
+
+
+async def drive(args, samples, statuses):
+    import httpx
+    import main
+
+    logging.getLogger().setLevel(getattr(logging, args.log_level))
+    async with main.app.router.lifespan_context(main.app):
+        # The probe polls a job that stays in progress for the whole run
+        await main.job_store.set(PROBE_JOB, {"status": "processing", "result": None, "error": None, "uid": PROBE_UID})
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load", timeout=None) as client:
+            stop = asyncio.Event()
+            poller = asyncio.create_task(poll(client, samples, "baseline", stop, args.poll_interval))
+            await asyncio.sleep(args.baseline_seconds)
+            stop.set()
+            await poller
+
+            stop = asyncio.Event()
+            poller = asyncio.create_task(poll(client, samples, "loaded", stop, args.poll_interval))
+            started = time.perf_counter()
+            await asyncio.gather(*(run_upload(client, i, args, statuses) for i in range(args.uploads)))
+            elapsed = time.perf_counter() - started
+            stop.set()
+            await poller
+            return elapsed
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Status-poll latency while uploads are in flight")
+    parser.add_argument("--uploads", type=int, default=20, help="uploads in flight at once")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--scanned", type=int, default=10, help="pages without a text layer (need OCR)")
+    parser.add_argument("--gcs-latency", type=float, default=0.2)
+    parser.add_argument("--docai-latency", type=float, default=2.0)
+    parser.add_argument("--groq-latency", type=float, default=1.0)
+    parser.add_argument("--tavily-latency", type=float, default=0.5)
+    parser.add_argument("--poll-interval", type=float, default=0.05)
+    parser.add_argument("--job-poll-interval", type=float, default=0.5)
+    parser.add_argument("--baseline-seconds", type=float, default=3.0)
+    parser.add_argument("--max-ratio", type=float, default=3.0)
+    parser.add_argument("--slack-ms", type=float, default=20.0)
+    parser.add_argument("--job-store", default="sqlite", choices=("sqlite", "memory"))
+    parser.add_argument("--log-level", default="WARNING", choices=("DEBUG", "INFO", "WARNING", "ERROR"))
+    args = parser.parse_args()
+
+    config = FakeConfig(
+        gcs_latency=args.gcs_latency,
+        docai_latency=args.docai_latency,
+        groq_latency=args.groq_latency,
+        tavily_latency=args.tavily_latency,
+    )
+    tavily = TavilyStubServer(config).start()
+    workdir = tempfile.mkdtemp(prefix="load-")
+    os.environ.update({
+        "GOOGLE_CLOUD_PROJECT": "load-project",
+        "DOCUMENT_AI_PROCESSOR_ID": "load-processor",
+        "GCS_BUCKET_NAME": "load-bucket",
+        "GROQ_API_KEY": "load",
+        "TAVILY_API_KEY": "load",
+        "TAVILY_API_URL": tavily.url,
+        "JOB_STORE_BACKEND": args.job_store,
+        "JOB_STORE_PATH": os.path.join(workdir, "jobs.sqlite3"),
+        # Every document is distinct: the result cache only takes writes, which must stay off the loop
+        "RESULT_CACHE_BACKEND": "sqlite",
+        "SEARCH_CACHE_MAX_ENTRIES": "0",
+        "RESULT_CACHE_PATH": os.path.join(workdir, "results.sqlite3"),
+        "ARTIFACT_STORE_PATH": os.path.join(workdir, "artifacts"),
+        # Every upload runs at once rather than waiting in the pipeline queue
+        "PIPELINE_WORKERS": str(args.uploads),
+        "PIPELINE_QUEUE_SIZE": str(args.uploads),
+        "PIPELINE_QUEUE_PER_USER": str(args.uploads),
+    })
+    for provider in ("GCS", "DOCUMENT_AI", "GROQ", "TAVILY"):
+        os.environ.setdefault(f"{provider}_RATE_LIMIT_PER_MINUTE", "0")
+    install_fakes(config)
+
+    samples = defaultdict(list)
+    statuses = Counter()
+    try:
+        elapsed = asyncio.run(drive(args, samples, statuses))
+    finally:
+        tavily.stop()
+
+    print(summarize(samples))
+    print()
+    print(f"uploads={args.uploads} pages={args.pages} scanned={args.scanned} job_store={args.job_store} wall={elapsed:.2f}s")
+    print("outcomes: " + ", ".join(f"{name}={count}" for name, count in sorted(statuses.items())))
+    failed = False
+    for endpoint in ("status_poll", "health"):
+        baseline = percentile(samples[f"baseline.{endpoint}"], 95)
+        loaded = percentile(samples[f"loaded.{endpoint}"], 95)
+        limit = baseline * args.max_ratio + args.slack_ms / 1000
+        ok = loaded <= limit
+        failed = failed or not ok
+        print(f"{endpoint}: p95 baseline={baseline * 1000:.1f}ms loaded={loaded * 1000:.1f}ms "
+              f"limit={limit * 1000:.1f}ms {'OK' if ok else 'FAIL'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,116 @@
+import math
+import re
+from collections import Counter
+from typing import List, Optional
+
+# Splitting long documents into LLM-sized chunks and choosing which chunks to send.
+# Chunks follow page boundaries (then paragraph boundaries for oversized pages), and a
+# TF-IDF salience ranking keeps the number of chunks analysed growing with sqrt(length).
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being
+below between both but by can could did do does doing down during each few for from further had has
+have having he her here hers him his how i if in into is it its itself just me more most my no nor
+not now of off on once only or other our out over own same she should so some such than that the
+their them then there these they this those through to too under until up very was we were what
+when where which while who whom why will with would you your figure table page chapter section
+""".split())
+
+TOKEN_RE = re.compile(r"[a-zA-Z][a-zA-Z0-9\-]{2,}")
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in (t.lower() for t in TOKEN_RE.findall(text)) if token not in STOPWORDS]
+
+
+# Hard-split one oversized piece of text on paragraph, then line, then character boundaries
+def split_text(text: str, max_chars: int) -> List[str]:
+    if len(text) <= max_chars:
+        return [text]
+    for separator in ("\n\n", "\n"):
+        parts = text.split(separator)
+        if len(parts) > 1:
+            pieces, current = [], ""
+            for part in parts:
+                candidate = f"{current}{separator}{part}" if current else part
+                if len(candidate) <= max_chars:
+                    current = candidate
+                    continue
+                if current:
+                    pieces.append(current)
+                current = part
+            if current:
+                pieces.append(current)
+            return [piece for part in pieces for piece in split_text(part, max_chars)]
+    return [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+
+
+# Group pages into chunks of at most max_chars, never splitting a page unless it alone is too long
+def split_into_chunks(text: str, page_texts: Optional[List[str]], max_chars: int) -> List[str]:
+    units = page_texts if page_texts else [text]
+    chunks, current = [], ""
+    for unit in units:
+        unit = unit.strip()
+        if not unit:
+            continue
+        for piece in split_text(unit, max_chars):
+            if current and len(current) + len(piece) + 1 > max_chars:
+                chunks.append(current)
+                current = ""
+            current = f"{current}\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+# Salience of each chunk: mean TF-IDF weight of its terms, damped by length
+def salience_scores(chunks: List[str]) -> List[float]:
+    token_lists = [tokenize(chunk) for chunk in chunks]
+    document_frequency = Counter()
+    for tokens in token_lists:
+        document_frequency.update(set(tokens))
+    total = len(chunks)
+    scores = []
+    for tokens in token_lists:
+        if not tokens:
+            scores.append(0.0)
+            continue
+        counts = Counter(tokens)
+        weight = sum(
+            (1 + math.log(count)) * math.log((1 + total) / (1 + document_frequency[term])) + 1
+            for term, count in counts.items()
+        )
+        scores.append(weight / math.sqrt(len(tokens)))
+    return scores
+
+
+# How many chunks to analyse: grows with sqrt(chunk count), capped at max_chunks
+def chunk_budget(chunk_count: int, budget_factor: float, max_chunks: int) -> int:
+    return max(1, min(chunk_count, max_chunks, math.ceil(budget_factor * math.sqrt(chunk_count))))
+
+
+# Pick the chunks to send to the LLM: always the opening chunk, then the most salient ones,
+# returned in document order
+def select_chunks(chunks: List[str], budget: int) -> List[str]:
+    if len(chunks) <= budget:
+        return chunks
+    scores = salience_scores(chunks)
+    ranked = sorted(range(1, len(chunks)), key=lambda i: scores[i], reverse=True)
+    keep = sorted([0] + ranked[:budget - 1])
+    return [chunks[i] for i in keep]
+
+
+# Local reduce step used when the LLM merge fails: collapse topics with the same normalised
+# name and order by how many chunks produced them
+def dedupe_topics(topics: List[dict]) -> List[dict]:
+    groups = {}
+    for topic in topics:
+        key = " ".join(tokenize(topic.get("name", ""))) or topic.get("name", "").strip().lower()
+        if not key:
+            continue
+        if key in groups:
+            groups[key]["count"] += 1
+        else:
+            groups[key] = {"count": 1, "order": len(groups), "topic": topic}
+    ranked = sorted(groups.values(), key=lambda g: (-g["count"], g["order"]))
+    return [group["topic"] for group in ranked]
@@ -0,0 +1,60 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Dict, List, Set
+
+logger = logging.getLogger(__name__)
+
+# In-process pub/sub of pipeline progress events, consumed by the SSE endpoint.
+# Each subscriber gets a bounded queue; when a slow client falls behind, the oldest pending
+# events are dropped (the final "result" event is always the newest, so it is never lost).
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "32"))
+
+
+class JobEventBus:
+    def __init__(self, queue_size: int = EVENT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._history: Dict[str, List[dict]] = {}  # events of jobs still running, replayed to late subscribers
+
+    def subscribe(self, uuid: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(uuid, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, uuid: str, queue: asyncio.Queue) -> None:
+        subscribers = self._subscribers.get(uuid)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._subscribers[uuid]
+
+    def history(self, uuid: str) -> List[dict]:
+        return list(self._history.get(uuid, []))
+
+    def publish(self, uuid: str, event: str, data: dict) -> None:
+        message = {"event": event, "data": data}
+        if event == "result":
+            self._history.pop(uuid, None)
+        elif event != "status":  # current status is replayed from the job store instead
+            history = self._history.setdefault(uuid, [])
+            history.append(message)
+            del history[:-self.queue_size]
+        for queue in self._subscribers.get(uuid, ()):
+            if queue.full():
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    pass
+                logger.debug(f"[EVENTS] Subscriber for {uuid} is falling behind, dropped oldest event")
+            queue.put_nowait(message)
+
+    # Forget a job's events without notifying anyone (e.g. job replaced by a re-upload)
+    def reset(self, uuid: str) -> None:
+        self._history.pop(uuid, None)
+
+
+def format_sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
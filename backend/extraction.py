@@ -0,0 +1,133 @@
+import asyncio
+import functools
+import io
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Union
+
+from pypdf import PdfReader, PdfWriter
+
+logger = logging.getLogger(__name__)
+
+# In-process text-layer extraction for born-digital PDFs. Runs in a process pool because
+# pypdf is pure Python and CPU bound; only pages without usable text go to Document AI.
+EXTRACTION_PROCESSES = int(os.getenv("EXTRACTION_PROCESSES", "2"))
+LOCAL_TEXT_MIN_CHARS = int(os.getenv("LOCAL_TEXT_MIN_CHARS", "32"))
+LOCAL_TEXT_MIN_ALNUM_RATIO = float(os.getenv("LOCAL_TEXT_MIN_ALNUM_RATIO", "0.3"))
+# A pathological PDF must not hold an extraction slot forever
+EXTRACTION_TIMEOUT_SECONDS = float(os.getenv("EXTRACTION_TIMEOUT_SECONDS", "60"))
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+class ExtractionTimeout(Exception):
+    pass
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        # spawn, not fork: the parent holds gRPC channels and threads that must not be forked
+        _process_pool = ProcessPoolExecutor(
+            max_workers=EXTRACTION_PROCESSES,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _process_pool
+
+
+# A worker that overruns the timeout cannot be interrupted, so the whole pool is replaced and its
+# processes killed. Calls caught in a pool that was replaced (or broke) are retried once on the new one.
+async def run_in_process(func, *args, timeout: float = EXTRACTION_TIMEOUT_SECONDS):
+    loop = asyncio.get_running_loop()
+    for attempt in range(2):
+        pool = get_process_pool()
+        try:
+            return await asyncio.wait_for(loop.run_in_executor(pool, functools.partial(func, *args)), timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"[EXTRACT] {func.__name__} ran over {timeout:g}s, recycling the process pool")
+            _recycle_process_pool(pool)
+            raise ExtractionTimeout(f"{func.__name__} did not finish within {timeout:g}s")
+        except BrokenProcessPool:
+            _recycle_process_pool(pool)
+            if attempt:
+                raise
+            logger.warning(f"[EXTRACT] Process pool was recycled under {func.__name__}, retrying")
+
+
+def _recycle_process_pool(pool: ProcessPoolExecutor) -> None:
+    global _process_pool
+    if _process_pool is not pool:
+        return
+    _process_pool = None
+    # ProcessPoolExecutor has no public way to stop a busy worker; pending calls fail with BrokenProcessPool
+    for process in list((pool._processes or {}).values()):
+        process.kill()
+    pool.shutdown(wait=False)
+
+
+def shutdown_process_pool() -> None:
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+
+# PDFs are passed to worker processes by spool file path where possible, so the bytes are
+# never pickled across the process boundary
+def _reader(source: Union[str, bytes]) -> PdfReader:
+    return PdfReader(source if isinstance(source, str) else io.BytesIO(source))
+
+
+# Per-page text layer of a PDF (runs in a worker process)
+def extract_page_texts(source: Union[str, bytes]) -> List[str]:
+    reader = _reader(source)
+    texts = []
+    for page in reader.pages:
+        try:
+            texts.append(page.extract_text() or "")
+        except Exception:
+            texts.append("")
+    return texts
+
+
+# Build a PDF containing only the given zero-based pages (runs in a worker process)
+def select_pages(source: Union[str, bytes], page_numbers: List[int]) -> bytes:
+    reader = _reader(source)
+    writer = PdfWriter()
+    for number in page_numbers:
+        writer.add_page(reader.pages[number])
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+
+# A page needs OCR when its text layer is missing, too short or mostly non-text glyphs
+def has_usable_text(text: str) -> bool:
+    stripped = "".join(text.split())
+    if len(stripped) < LOCAL_TEXT_MIN_CHARS:
+        return False
+    alnum = sum(1 for ch in stripped if ch.isalnum())
+    return alnum / len(stripped) >= LOCAL_TEXT_MIN_ALNUM_RATIO
+
+
+# Split a Document AI document's text back into per-page strings using the page layout anchors
+def document_page_texts(document) -> List[str]:
+    texts = []
+    for page in document.pages:
+        segments = page.layout.text_anchor.text_segments
+        texts.append("".join(
+            document.text[int(segment.start_index):int(segment.end_index)] for segment in segments
+        ))
+    return texts
+
+
+# Shape the pipeline's {"text", "pages"} result from per-page texts
+def build_doc_result(page_texts: List[str]) -> dict:
+    return {
+        "text": "\n".join(page_texts),
+        "pages": len(page_texts),
+        "page_texts": page_texts
+    }
@@ -0,0 +1,137 @@
+import asyncio
+import datetime
+import logging
+import os
+from typing import Dict, List, Optional, Set
+
+from executor import run_blocking
+
+logger = logging.getLogger(__name__)
+
+# Background cleanup of the pipeline's GCS objects (uploaded PDFs and Document AI batch output).
+# Jobs register the objects they create and release them once their results are persisted; the
+# sweeper deletes released objects in batch requests from a background loop, so no request ever
+# waits on a delete and no exists() round trip is made (missing objects are simply ignored).
+# Objects left behind by crashed workers are reclaimed by age, on startup and periodically, with
+# listing capped per prefix.
+GCS_SWEEP_INTERVAL_SECONDS = float(os.getenv("GCS_SWEEP_INTERVAL_SECONDS", "5"))
+GCS_SWEEP_BATCH_SIZE = int(os.getenv("GCS_SWEEP_BATCH_SIZE", "100"))  # GCS batch request limit
+GCS_ORPHAN_MAX_AGE_SECONDS = float(os.getenv("GCS_ORPHAN_MAX_AGE_SECONDS", str(6 * 3600)))
+GCS_ORPHAN_SWEEP_INTERVAL_SECONDS = float(os.getenv("GCS_ORPHAN_SWEEP_INTERVAL_SECONDS", str(6 * 3600)))
+GCS_ORPHAN_MAX_LISTED = int(os.getenv("GCS_ORPHAN_MAX_LISTED", "5000"))
+
+
+class GCSSweeper:
+    # `prefixes` are scanned for orphans; `call` runs a coroutine function under the provider's
+    # limits (the GCS Provider's call), defaulting to a plain await
+    def __init__(self, client, bucket, prefixes: List[str], call=None):
+        self.client = client
+        self.bucket = bucket
+        self.prefixes = prefixes
+        self.call = call or (lambda func, *args, **kwargs: func(*args, **kwargs))
+        self._owned: Dict[str, Set[str]] = {}  # job id -> object names
+        self._names: Set[str] = set()
+        self._prefixes: Set[str] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._loop())
+
+    # Flush what is already released, then stop
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            await self._sweep()
+        except Exception as e:
+            logger.warning(f"[GCS SWEEP] Final sweep failed: {str(e)}")
+
+    # Remember an object created for a job; it is deleted after release(job_id)
+    def track(self, job_id: str, name: str) -> None:
+        self._owned.setdefault(job_id, set()).add(name)
+
+    def release(self, job_id: str) -> None:
+        names = self._owned.pop(job_id, None)
+        if names:
+            self._names.update(names)
+            self._wake()
+
+    def delete(self, name: str) -> None:
+        self._names.add(name)
+        self._wake()
+
+    def delete_prefix(self, prefix: str) -> None:
+        self._prefixes.add(prefix)
+        self._wake()
+
+    def _wake(self) -> None:
+        if self._wakeup is not None and len(self._names) >= GCS_SWEEP_BATCH_SIZE:
+            self._wakeup.set()
+
+    async def _loop(self) -> None:
+        next_orphan_sweep = 0.0  # first pass runs on startup
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                if loop.time() >= next_orphan_sweep:
+                    next_orphan_sweep = loop.time() + GCS_ORPHAN_SWEEP_INTERVAL_SECONDS
+                    await self._reclaim_orphans()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=GCS_SWEEP_INTERVAL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                await self._sweep()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[GCS SWEEP] Sweep failed: {str(e)}")
+                await asyncio.sleep(GCS_SWEEP_INTERVAL_SECONDS)
+
+    async def _sweep(self) -> None:
+        prefixes, self._prefixes = self._prefixes, set()
+        for prefix in prefixes:
+            try:
+                self._names.update(await self.call(run_blocking, self._list, prefix))
+            except Exception:
+                self._prefixes.add(prefix)
+                raise
+        names, self._names = sorted(self._names), set()
+        for start in range(0, len(names), GCS_SWEEP_BATCH_SIZE):
+            batch = names[start:start + GCS_SWEEP_BATCH_SIZE]
+            try:
+                await self.call(run_blocking, self._delete_batch, batch)
+            except Exception:
+                self._names.update(names[start:])
+                raise
+        if names:
+            logger.info(f"[GCS SWEEP] Swept {len(names)} objects")
+
+    def _list(self, prefix: str) -> List[str]:
+        return [blob.name for blob in self.client.list_blobs(self.bucket.name, prefix=prefix)]
+
+    # One batch request; objects that are already gone are not an error
+    def _delete_batch(self, names: List[str]) -> None:
+        with self.client.batch(raise_exception=False):
+            for name in names:
+                self.bucket.delete_blob(name)
+
+    # Objects under the pipeline prefixes that are older than any job could run and not owned by a
+    # job on this worker
+    async def _reclaim_orphans(self) -> None:
+        cutoff = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=GCS_ORPHAN_MAX_AGE_SECONDS)
+        owned = set().union(*self._owned.values()) if self._owned else set()
+
+        def find(prefix: str) -> List[str]:
+            blobs = self.client.list_blobs(self.bucket.name, prefix=prefix, max_results=GCS_ORPHAN_MAX_LISTED)
+            return [blob.name for blob in blobs if blob.time_created and blob.time_created < cutoff and blob.name not in owned]
+
+        for prefix in self.prefixes:
+            orphans = await self.call(run_blocking, find, prefix)
+            if orphans:
+                logger.info(f"[GCS SWEEP] Reclaiming {len(orphans)} orphaned objects under {prefix}")
+                self._names.update(orphans)
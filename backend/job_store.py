@@ -0,0 +1,213 @@
+import asyncio
+import functools
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Job state shared by every worker: uuid -> {status, result, error}, plus a cancel flag so that
+# /api/halt_pdf_process can stop a job running on another worker. Finished jobs expire after a TTL;
+# queued and processing jobs get a longer one, so state left behind by a crashed worker is evicted too.
+FINISHED_STATUSES = ("done", "failed", "cancelled")
+
+
+class JobStore:
+    def get(self, uuid: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def set(self, uuid: str, state: dict) -> None:
+        raise NotImplementedError
+
+    def delete(self, uuid: str) -> None:
+        raise NotImplementedError
+
+    def request_cancel(self, uuid: str) -> None:
+        raise NotImplementedError
+
+    # Which of the given uuids have a pending cancel request
+    def cancel_requested(self, uuids: Iterable[str]) -> List[str]:
+        raise NotImplementedError
+
+    def evict_expired(self) -> int:
+        raise NotImplementedError
+
+
+class MemoryJobStore(JobStore):
+    def __init__(self, ttl_seconds: float, active_ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.active_ttl_seconds = active_ttl_seconds
+        self._jobs: Dict[str, dict] = {}
+        self._expires: Dict[str, float] = {}
+        self._cancel: set = set()
+        self._lock = threading.Lock()
+
+    def get(self, uuid: str) -> Optional[dict]:
+        with self._lock:
+            expires_at = self._expires.get(uuid)
+            if expires_at is not None and expires_at < time.time():
+                self._drop(uuid)
+                return None
+            return self._jobs.get(uuid)
+
+    def set(self, uuid: str, state: dict) -> None:
+        with self._lock:
+            self._jobs[uuid] = state
+            if state.get("status") in FINISHED_STATUSES:
+                self._expires[uuid] = time.time() + self.ttl_seconds
+            else:
+                self._expires[uuid] = time.time() + self.active_ttl_seconds
+                self._cancel.discard(uuid)
+
+    def delete(self, uuid: str) -> None:
+        with self._lock:
+            self._drop(uuid)
+
+    def request_cancel(self, uuid: str) -> None:
+        with self._lock:
+            self._cancel.add(uuid)
+
+    def cancel_requested(self, uuids: Iterable[str]) -> List[str]:
+        with self._lock:
+            return [uuid for uuid in uuids if uuid in self._cancel]
+
+    def evict_expired(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [uuid for uuid, expires_at in self._expires.items() if expires_at < now]
+            for uuid in expired:
+                self._drop(uuid)
+        return len(expired)
+
+    def _drop(self, uuid: str) -> None:
+        self._jobs.pop(uuid, None)
+        self._expires.pop(uuid, None)
+        self._cancel.discard(uuid)
+
+
+# SQLite-backed store; point every worker/replica on a host at the same file
+class SQLiteJobStore(JobStore):
+    def __init__(self, path: str, ttl_seconds: float, active_ttl_seconds: float):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.active_ttl_seconds = active_ttl_seconds
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "uuid TEXT PRIMARY KEY, state TEXT NOT NULL, cancel_requested INTEGER NOT NULL DEFAULT 0, "
+            "expires_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_expires ON jobs (expires_at)")
+        # Rows written before unfinished jobs had a TTL
+        self._conn.execute("UPDATE jobs SET expires_at = ? WHERE expires_at IS NULL", (time.time() + active_ttl_seconds,))
+
+    def get(self, uuid: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT state, expires_at FROM jobs WHERE uuid = ?", (uuid,)).fetchone()
+        if row is None:
+            return None
+        state, expires_at = row
+        if expires_at is not None and expires_at < time.time():
+            self.delete(uuid)
+            return None
+        return json.loads(state)
+
+    def set(self, uuid: str, state: dict) -> None:
+        finished = state.get("status") in FINISHED_STATUSES
+        expires_at = time.time() + (self.ttl_seconds if finished else self.active_ttl_seconds)
+        with self._lock:
+            if finished:
+                self._conn.execute(
+                    "INSERT INTO jobs (uuid, state, expires_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(uuid) DO UPDATE SET state = excluded.state, expires_at = excluded.expires_at",
+                    (uuid, json.dumps(state), expires_at),
+                )
+            else:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO jobs (uuid, state, cancel_requested, expires_at) VALUES (?, ?, 0, ?)",
+                    (uuid, json.dumps(state), expires_at),
+                )
+
+    def delete(self, uuid: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE uuid = ?", (uuid,))
+
+    def request_cancel(self, uuid: str) -> None:
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE uuid = ?", (uuid,))
+
+    def cancel_requested(self, uuids: Iterable[str]) -> List[str]:
+        uuids = list(uuids)
+        if not uuids:
+            return []
+        placeholders = ",".join("?" * len(uuids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT uuid FROM jobs WHERE cancel_requested = 1 AND uuid IN ({placeholders})", uuids
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def evict_expired(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM jobs WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),))
+        return cursor.rowcount
+
+
+# Async front of a JobStore for the event loop. Store calls (SQLite writes, fsyncs, busy waits on a
+# file shared with other workers) run on one dedicated thread: never on the event loop, never holding
+# threads of the blocking pool, and in the order they were made, so a job's state changes land in order.
+class AsyncJobStore:
+    def __init__(self, store: JobStore):
+        self.store = store
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    async def _run(self, func, *args):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-store")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args))
+
+    async def get(self, uuid: str) -> Optional[dict]:
+        return await self._run(self.store.get, uuid)
+
+    async def set(self, uuid: str, state: dict) -> None:
+        await self._run(self.store.set, uuid, state)
+
+    async def delete(self, uuid: str) -> None:
+        await self._run(self.store.delete, uuid)
+
+    async def request_cancel(self, uuid: str) -> None:
+        await self._run(self.store.request_cancel, uuid)
+
+    async def cancel_requested(self, uuids: Iterable[str]) -> List[str]:
+        return await self._run(self.store.cancel_requested, list(uuids))
+
+    async def evict_expired(self) -> int:
+        return await self._run(self.store.evict_expired)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+# Build the job store from JOB_STORE_* environment variables
+def build_job_store() -> AsyncJobStore:
+    kind = os.getenv("JOB_STORE_BACKEND", "memory").lower()
+    ttl_seconds = float(os.getenv("JOB_TTL_SECONDS", "3600"))
+    # Longer than any job can run (the Document AI timeout is capped at an hour)
+    active_ttl_seconds = float(os.getenv("JOB_ACTIVE_TTL_SECONDS", str(6 * 3600)))
+    if kind == "sqlite":
+        store = SQLiteJobStore(os.getenv("JOB_STORE_PATH", "cache/jobs.sqlite3"), ttl_seconds, active_ttl_seconds)
+    else:
+        store = MemoryJobStore(ttl_seconds, active_ttl_seconds)
+    logger.info(f"[JOBS] Job store backend: {type(store).__name__}")
+    return AsyncJobStore(store)
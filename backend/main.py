@@ -1,4 +1,4 @@
-from fastapi import FastAPI, UploadFile, HTTPException, Request, File, Header
+from fastapi import FastAPI, HTTPException, Request, File, Header, Depends, Query
 import logging
 from fastapi.middleware.cors import CORSMiddleware
 from google.cloud import documentai_v1 as documentai
@@ -12,24 +12,43 @@ from dotenv import load_dotenv
 import uuid
 import json
 import httpx
-from typing import List, Dict
+from typing import AsyncIterator, Callable, List, Dict, Optional
 import asyncio
+import threading
+from contextlib import aclosing, asynccontextmanager
 import re
-import firebase_admin
-from firebase_admin import credentials, auth as admin_auth
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
+from result_cache import build_result_cache, fingerprint
+from job_store import FINISHED_STATUSES, build_job_store
+from scheduler import QueueFullError, build_scheduler
+from chunking import chunk_budget, dedupe_topics, select_chunks, split_into_chunks
+from events import JobEventBus, format_sse
+from metrics import (
+    DOCUMENT_AI_BATCH_DOCUMENTS, DOCUMENT_AI_OPERATION_SECONDS, DOCUMENT_AI_OPERATIONS_IN_FLIGHT, EXTERNAL_CALL_ERRORS, JOBS_IN_FLIGHT, JOBS_QUEUED, PDF_BYTES, PDF_PAGES,
+    endpoint_timer, record_cache_lookup, render_metrics, stage_timer
+)
+from executor import run_blocking, shutdown_executor
+from batching import BatchCoalescer
+from operation_poller import OperationTimeout, build_operation_poller
+from token_auth import InvalidToken, build_token_verifier
+from search_cache import build_search_cache, normalize_query, normalize_url
+from artifacts import DOCUMENT, PAGES, build_artifact_store
+from topic_stream import TopicParseError, TopicStreamParser
+from resilience import RETRYABLE_STATUS_CODES, RetryableStatus, build_providers
+from gcs_sweeper import GCSSweeper
+from structured_logging import KeyedRateLimiter, bind_log_context, setup_logging, truncate
+from upload import MAX_UPLOAD_BYTES, SpooledUpload, UploadError, UploadTooLarge, receive_upload
+from extraction import (
+    build_doc_result, document_page_texts, extract_page_texts, has_usable_text,
+    run_in_process, select_pages, shutdown_process_pool
+)
 
 # Environment variables
 load_dotenv()
 
-# Initialize Firebase Admin only once
-if not firebase_admin._apps:
-    cred = credentials.Certificate(r"C:\Users\User\Desktop\pdf-to-learning-resource-analyzer\backend\credentials\einstein-ai-prod-firebase-adminsdk-fbsvc-dd7d84d7e2.json")
-    firebase_admin.initialize_app(cred)
-
 # Initialize logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+setup_logging()
 logger = logging.getLogger(__name__)
 
 # Initialize clients
@@ -37,7 +56,10 @@ LOCATION = os.getenv('DOCUMENT_AI_LOCATION', 'us')
 opts = client_options.ClientOptions(api_endpoint=f"{LOCATION}-documentai.googleapis.com")
 document_ai_client = documentai.DocumentProcessorServiceClient(client_options=opts)
 storage_client = storage.Client()
-groq_client = Groq(api_key=os.getenv('GROQ_API_KEY'))
+# Retries are left to the provider layer below; SDK retries would multiply its attempts
+groq_client = Groq(api_key=os.getenv('GROQ_API_KEY'), max_retries=0)
+# Rate limits, retries and circuit breakers for each external provider
+providers = build_providers()
 
 # All the environment variables 
 PROJECT_ID = os.getenv('GOOGLE_CLOUD_PROJECT')
@@ -51,7 +73,53 @@ PROCESSOR_NAME = document_ai_client.processor_path(PROJECT_ID, LOCATION, PROCESS
 
 bucket = storage_client.bucket(BUCKET_NAME)
 
-app = FastAPI()
+# Per-stage result cache keyed by the SHA-256 of the uploaded PDF; called through run_blocking,
+# since the SQLite backend does disk I/O
+result_cache = build_result_cache()
+artifact_store = build_artifact_store(bucket)
+
+# Shared HTTP connection pool for outbound API calls (Tavily), created at startup
+TAVILY_URL = os.getenv("TAVILY_API_URL", "https://api.tavily.com/search")
+TAVILY_CONCURRENCY = int(os.getenv("TAVILY_CONCURRENCY", "5"))
+TAVILY_QUERY_TIMEOUT = float(os.getenv("TAVILY_QUERY_TIMEOUT", "30"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "50"))
+
+http_client: Optional[httpx.AsyncClient] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    global http_client
+    if http_client is None or http_client.is_closed:
+        http_client = httpx.AsyncClient(
+            timeout=TAVILY_QUERY_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_CONNECTIONS
+            )
+        )
+    return http_client
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    get_http_client()
+    logger.info("[STARTUP] Shared HTTP client created.")
+    maintenance_task = asyncio.create_task(job_maintenance_loop())
+    scheduler.start()
+    operation_poller.start()
+    gcs_sweeper.start()
+    yield
+    await scheduler.stop()
+    await document_batcher.stop()
+    await operation_poller.stop()
+    await gcs_sweeper.stop()
+    maintenance_task.cancel()
+    if http_client is not None:
+        await http_client.aclose()
+        logger.info("[SHUTDOWN] Shared HTTP client closed.")
+    job_store.shutdown()
+    shutdown_executor()
+    shutdown_process_pool()
+
+app = FastAPI(lifespan=lifespan)
 
 # Configure CORS
 # app.add_middleware(
@@ -70,131 +138,307 @@ app.add_middleware(
     allow_headers=["*", "x-firebase-token"],  # <--- Ensure your custom header is allowed!
 )
 
-MAX_FILE_SIZE = 5 * 1024 * 1024
+MAX_FILE_SIZE = MAX_UPLOAD_BYTES
 
 # Helper to verify Firebase ID token and get UID
 import time
 import traceback
 
+FIREBASE_PROJECT_ID = os.getenv("FIREBASE_PROJECT_ID") or PROJECT_ID
+token_verifier = build_token_verifier(FIREBASE_PROJECT_ID)
+
+# FastAPI dependency: tokens seen before are answered from the verified-token cache on the
+# event loop; new ones are verified in the blocking pool
 async def get_uid_from_request(request: Request) -> str:
     id_token = request.headers.get("x-firebase-token")
-    logger.info(f"[AUTH] x-firebase-token header: {id_token[:30] + '...' if id_token else None}")
     if not id_token:
         logger.warning("[AUTH] No ID token provided in request headers.")
         raise HTTPException(status_code=401, detail="Missing ID token")
+    uid = token_verifier.cached_uid(id_token)
+    record_cache_lookup("auth", uid is not None)
+    if uid is not None:
+        return uid
     try:
-        decoded_token = admin_auth.verify_id_token(id_token)
-        logger.info(f"[AUTH] Token decoded successfully. UID: {decoded_token.get('uid')}")
-        return decoded_token["uid"]
-    except Exception as e:
-        logger.error(f"[AUTH] Token verification failed: {e}")
+        uid = await run_blocking(token_verifier.verify, id_token)
+    except InvalidToken as e:
+        logger.warning(f"[AUTH] Token verification failed: {e}")
         raise HTTPException(status_code=401, detail="Invalid ID token")
+    logger.debug(f"[AUTH] Token verified for UID {uid}")
+    return uid
+
+# Files larger than one chunk go up as a resumable upload, streamed from the spool file chunk by chunk
+GCS_UPLOAD_CHUNK_BYTES = int(os.getenv("GCS_UPLOAD_CHUNK_BYTES", str(4 * 1024 * 1024)))  # multiple of 256 KiB
+
+# Uploads and batch OCR output live under their own prefixes, which the sweeper cleans up
+GCS_UPLOAD_PREFIX = os.getenv("GCS_UPLOAD_PREFIX", "uploads")
+DOCUMENT_AI_OUTPUT_PREFIX = os.getenv("DOCUMENT_AI_OUTPUT_PREFIX", "results")
+gcs_sweeper = GCSSweeper(
+    storage_client, bucket, [f"{GCS_UPLOAD_PREFIX}/", f"{DOCUMENT_AI_OUTPUT_PREFIX}/"], providers["gcs"].call
+)
 
-# Upload to GCS
-async def upload_to_gcs(content: bytes, filename: str, uid: str, uuid: str) -> str:
-    blob_name = f"{uuid}/{filename}"
+def upload_blob_name(uid: str, uuid: str, filename: str) -> str:
+    return f"{GCS_UPLOAD_PREFIX}/{uid}/{uuid}/{filename}"
+
+# Upload to GCS; the object is deleted by the sweeper once the job finishes
+async def upload_to_gcs(upload: SpooledUpload, filename: str, uid: str, uuid: str) -> str:
+    blob_name = upload_blob_name(uid, uuid, filename)
+    gcs_sweeper.track(uuid, blob_name)
     blob = bucket.blob(blob_name)
-    blob.upload_from_string(content, content_type="application/pdf")
+    if upload.size > GCS_UPLOAD_CHUNK_BYTES:
+        blob.chunk_size = GCS_UPLOAD_CHUNK_BYTES
+    emit_stage(uuid, "upload", "started")
+    await providers["gcs"].call(run_blocking, blob.upload_from_filename, upload.path, content_type="application/pdf")
+    emit_stage(uuid, "upload", "finished")
     return f"gs://{BUCKET_NAME}/{blob_name}"
 
-# Process document batch
-async def process_document_batch(gcs_input_uri: str) -> dict:
+# Download the first Document JSON written under a batch output prefix (blocking)
+def read_batch_output(output_bucket: str, output_prefix: str) -> Optional[documentai.Document]:
+    output_blobs = storage_client.list_blobs(output_bucket, prefix=output_prefix)
+    for blob in output_blobs:
+        if ".json" in blob.name:
+            logger.info(f"Processing output file: {blob.name}")
+            return documentai.Document.from_json(
+                blob.download_as_bytes(),
+                ignore_unknown_fields=True
+            )
+    return None
+
+# Documents waiting for batch OCR are coalesced: PDFs arriving within the window (up to the max
+# batch size) share one Document AI batch operation instead of starting one operation each.
+# DOCUMENT_AI_BATCH_MAX_OPERATIONS should stay within the project's concurrent batch quota.
+DOCUMENT_AI_BATCH_MAX_DOCUMENTS = int(os.getenv("DOCUMENT_AI_BATCH_MAX_DOCUMENTS", "10"))
+DOCUMENT_AI_BATCH_WINDOW_SECONDS = float(os.getenv("DOCUMENT_AI_BATCH_WINDOW_SECONDS", "0.5"))
+DOCUMENT_AI_BATCH_MAX_OPERATIONS = int(os.getenv("DOCUMENT_AI_BATCH_MAX_OPERATIONS", "5"))
+
+# Batch operations may run for as long as their pages need; documents we could not count pages
+# for are assumed to have DOCUMENT_AI_DEFAULT_PAGES
+DOCUMENT_AI_TIMEOUT_BASE_SECONDS = float(os.getenv("DOCUMENT_AI_TIMEOUT_BASE_SECONDS", "120"))
+DOCUMENT_AI_TIMEOUT_PER_PAGE_SECONDS = float(os.getenv("DOCUMENT_AI_TIMEOUT_PER_PAGE_SECONDS", "2"))
+DOCUMENT_AI_TIMEOUT_MAX_SECONDS = float(os.getenv("DOCUMENT_AI_TIMEOUT_MAX_SECONDS", "3600"))
+DOCUMENT_AI_DEFAULT_PAGES = int(os.getenv("DOCUMENT_AI_DEFAULT_PAGES", "50"))
+
+operation_poller = build_operation_poller()
+DOCUMENT_AI_OPERATIONS_IN_FLIGHT.set_function(operation_poller.in_flight)
+
+def batch_timeout(pages: int) -> float:
+    return min(DOCUMENT_AI_TIMEOUT_BASE_SECONDS + pages * DOCUMENT_AI_TIMEOUT_PER_PAGE_SECONDS, DOCUMENT_AI_TIMEOUT_MAX_SECONDS)
+
+# Turn one batch output document into the pipeline's text result
+async def read_batch_document(output_gcs_destination: str) -> dict:
+    matches = re.match(r"gs://(.*?)/(.*)", output_gcs_destination)
+    if not matches:
+        raise Exception(f"Invalid output destination: {output_gcs_destination}")
+    output_bucket, output_prefix = matches.groups()
+    document = await providers["gcs"].call(run_blocking, read_batch_output, output_bucket, output_prefix)
+    if not document:
+        raise Exception("No output document found")
+    return {
+        "text": document.text,
+        "pages": len(document.pages) if hasattr(document, 'pages') else 0,
+        "page_texts": document_page_texts(document),
+        "document": document
+    }
+
+# Run one Document AI batch operation over several GCS inputs, resolving each input as its output is read
+async def run_document_batch(inputs: List[tuple], resolve) -> None:
+    indexes_by_uri: Dict[str, List[int]] = {}
+    pages_by_uri: Dict[str, int] = {}
+    for index, (gcs_uri, pages) in enumerate(inputs):
+        indexes_by_uri.setdefault(gcs_uri, []).append(index)
+        pages_by_uri[gcs_uri] = pages or DOCUMENT_AI_DEFAULT_PAGES
+    gcs_documents = documentai.GcsDocuments(documents=[
+        documentai.GcsDocument(gcs_uri=gcs_uri, mime_type="application/pdf") for gcs_uri in indexes_by_uri
+    ])
+    input_config = documentai.BatchDocumentsInputConfig(gcs_documents=gcs_documents)
+
+    # Set up output configuration
+    output_uri_prefix = f"{DOCUMENT_AI_OUTPUT_PREFIX}/{uuid.uuid4()}/"
+    destination_uri = f"gs://{BUCKET_NAME}/{output_uri_prefix}"
+    gcs_output_config = documentai.DocumentOutputConfig.GcsOutputConfig(gcs_uri=destination_uri)
+    output_config = documentai.DocumentOutputConfig(gcs_output_config=gcs_output_config)
+
+    request = documentai.BatchProcessRequest(
+        name=PROCESSOR_NAME,
+        input_documents=input_config,
+        document_output_config=output_config
+    )
+
+    # The output is only needed until it has been read
     try:
-        # Set up GCS document
-        gcs_document = documentai.GcsDocument(
-            gcs_uri=gcs_input_uri,
-            mime_type="application/pdf"
-        )
-        
-        # Configure batch input
-        gcs_documents = documentai.GcsDocuments(documents=[gcs_document])
-        input_config = documentai.BatchDocumentsInputConfig(gcs_documents=gcs_documents)
-        
-        # Set up output configuration
-        output_uri_prefix = f"results/{uuid.uuid4()}/"
-        destination_uri = f"gs://{BUCKET_NAME}/{output_uri_prefix}"
-        
-        gcs_output_config = documentai.DocumentOutputConfig.GcsOutputConfig(
-            gcs_uri=destination_uri
-        )
-        output_config = documentai.DocumentOutputConfig(gcs_output_config=gcs_output_config)
-        
-        # Create batch request
-        request = documentai.BatchProcessRequest(
-            name=PROCESSOR_NAME,
-            input_documents=input_config,
-            document_output_config=output_config
-        )
-        
         # Start batch process
-        operation = document_ai_client.batch_process_documents(request)
-        logger.info(f"Started batch process operation: {operation.operation.name}")
-        
-        # Wait for completion with timeout
+        DOCUMENT_AI_BATCH_DOCUMENTS.observe(len(indexes_by_uri))
+        # Not idempotent: a retry after a deadline could start a second operation, so neither the
+        # provider layer nor the SDK's default retry may repeat it
+        operation = await providers["document_ai"].call_once(
+            run_blocking, document_ai_client.batch_process_documents, request, retry=None
+        )
+        logger.info(f"Started batch process operation: {operation.operation.name} ({len(indexes_by_uri)} documents)")
+
+        # Wait for completion without holding a thread; cancelling this task cancels the operation
+        started = time.perf_counter()
         try:
-            operation.result(timeout=120)  # 2 minute timeout
-        except Exception as e:
+            await operation_poller.wait(operation, batch_timeout(sum(pages_by_uri.values())))
+        except OperationTimeout as e:
+            DOCUMENT_AI_OPERATION_SECONDS.observe(time.perf_counter() - started, outcome="timeout")
             logger.error(f"Batch process error: {str(e)}")
             raise Exception("Document processing timed out")
-        
-        # Get metadata
+        DOCUMENT_AI_OPERATION_SECONDS.observe(time.perf_counter() - started, outcome="completed")
+
+        # Per-document statuses are reported even when the operation as a whole failed
         metadata = documentai.BatchProcessMetadata(operation.metadata)
-        if metadata.state != documentai.BatchProcessMetadata.State.SUCCEEDED:
-            raise Exception(f"Batch process failed: {metadata.state_message}")
-        
-        # Get the first process status
         if not metadata.individual_process_statuses:
+            if metadata.state != documentai.BatchProcessMetadata.State.SUCCEEDED:
+                raise Exception(f"Batch process failed: {metadata.state_message}")
             raise Exception("No processing results found")
-            
-        process = metadata.individual_process_statuses[0]
-        matches = re.match(r"gs://(.*?)/(.*)", process.output_gcs_destination)
-        if not matches:
-            raise Exception(f"Invalid output destination: {process.output_gcs_destination}")
-            
-        output_bucket, output_prefix = matches.groups()
-        
-        # Get output JSON
-        output_blobs = storage_client.list_blobs(output_bucket, prefix=output_prefix)
-        document = None
-        
-        for blob in output_blobs:
-            if ".json" in blob.name:
-                logger.info(f"Processing output file: {blob.name}")
-                document = documentai.Document.from_json(
-                    blob.download_as_bytes(),
-                    ignore_unknown_fields=True
-                )
-                break
-                
-        if not document:
-            raise Exception("No output document found")
-        
-        
-        # Extract text
+
+        async def read_one(process) -> None:
+            indexes = indexes_by_uri.get(process.input_gcs_source)
+            if not indexes:
+                logger.warning(f"[DOCUMENT AI] Unexpected batch status for {process.input_gcs_source}")
+                return
+            if process.status.code != 0:
+                result = Exception(f"Batch process failed: {process.status.message}")
+            else:
+                try:
+                    result = await read_batch_document(process.output_gcs_destination)
+                except Exception as e:
+                    result = e
+            for index in indexes:
+                resolve(index, result)
+
+        await asyncio.gather(*(read_one(process) for process in metadata.individual_process_statuses))
+        if metadata.state != documentai.BatchProcessMetadata.State.SUCCEEDED:
+            raise Exception(f"Batch process failed: {metadata.state_message}")
+    finally:
+        gcs_sweeper.delete_prefix(output_uri_prefix)
+
+document_batcher = BatchCoalescer(
+    "document_ai", run_document_batch, DOCUMENT_AI_BATCH_MAX_DOCUMENTS, DOCUMENT_AI_BATCH_WINDOW_SECONDS,
+    DOCUMENT_AI_BATCH_MAX_OPERATIONS
+)
+
+# Process document batch
+async def process_document_batch(gcs_input_uri: str, pages: Optional[int] = None) -> dict:
+    try:
+        return await document_batcher.submit((gcs_input_uri, pages))
+    except Exception as e:
+        logger.error(f"Document AI Error: {str(e)}")
+        raise Exception(f"Failed to process PDF: {str(e)}")
+
+# Documents up to this size go through the synchronous online processor instead of batch mode
+DOCUMENT_AI_ONLINE_MAX_PAGES = int(os.getenv("DOCUMENT_AI_ONLINE_MAX_PAGES", "15"))
+DOCUMENT_AI_ONLINE_MAX_BYTES = int(os.getenv("DOCUMENT_AI_ONLINE_MAX_BYTES", str(20 * 1024 * 1024)))
+
+# Process a small PDF with the online (synchronous) Document AI endpoint
+async def process_document_online(content: bytes) -> dict:
+    try:
+        request = documentai.ProcessRequest(
+            name=PROCESSOR_NAME,
+            raw_document=documentai.RawDocument(content=content, mime_type="application/pdf")
+        )
+        result = await providers["document_ai"].call(run_blocking, document_ai_client.process_document, request=request, retry=None)
+        document = result.document
         return {
             "text": document.text,
-            "pages": len(document.pages) if hasattr(document, 'pages') else 0
+            "pages": len(document.pages),
+            "page_texts": document_page_texts(document),
+            "document": document
         }
-        
     except Exception as e:
         logger.error(f"Document AI Error: {str(e)}")
         raise Exception(f"Failed to process PDF: {str(e)}")
 
-# Extracts JSON block from LLM response
-def extract_json(text: str) -> str:
-    match = re.search(r'```(?:json)?(.*?)```', text, re.DOTALL)
-    return match.group(1).strip() if match else text.strip()
-
-# Extract key information using Groq LLM API
-async def analyze_with_groq(text: str) -> Dict:
+# Extract text: local text layer first, Document AI only for pages without usable text
+async def extract_document(upload: SpooledUpload, filename: str, uid: str, uuid: str) -> dict:
     try:
-        prompt = f"""
+        page_texts = await run_in_process(extract_page_texts, upload.path)
+    except Exception as e:
+        logger.warning(f"[EXTRACT] Local text extraction failed, using Document AI for {uuid}: {e}")
+        page_texts = None
+
+    if page_texts is None:
+        # Unreadable locally: OCR the whole document
+        if upload.size <= DOCUMENT_AI_ONLINE_MAX_BYTES:
+            try:
+                return await process_document_online(await run_blocking(upload.read_bytes))
+            except Exception as e:
+                logger.warning(f"[EXTRACT] Online processing failed for {uuid}, falling back to batch: {e}")
+        gcs_uri = await upload_to_gcs(upload, filename, uid, uuid)
+        logger.info(f"[ANALYZE PDF] Uploaded {filename} to GCS URI: {gcs_uri}")
+        return await process_document_batch(gcs_uri)
+
+    ocr_pages = [i for i, text in enumerate(page_texts) if not has_usable_text(text)]
+    logger.info(f"[EXTRACT] {uuid}: {len(page_texts) - len(ocr_pages)}/{len(page_texts)} pages have a text layer")
+    if not ocr_pages:
+        return build_doc_result(page_texts)
+
+    ocr_texts = ocr_document = None
+    if len(ocr_pages) <= DOCUMENT_AI_ONLINE_MAX_PAGES:
+        if len(ocr_pages) == len(page_texts):
+            ocr_content = await run_blocking(upload.read_bytes) if upload.size <= DOCUMENT_AI_ONLINE_MAX_BYTES else None
+        else:
+            try:
+                ocr_content = await run_in_process(select_pages, upload.path, ocr_pages)
+            except Exception as e:
+                logger.warning(f"[EXTRACT] Could not split out the OCR pages of {uuid}, using batch: {e}")
+                ocr_content = None
+        if ocr_content is not None and len(ocr_content) <= DOCUMENT_AI_ONLINE_MAX_BYTES:
+            try:
+                ocr_result = await process_document_online(ocr_content)
+                ocr_texts, ocr_document = ocr_result["page_texts"], ocr_result["document"]
+            except Exception as e:
+                logger.warning(f"[EXTRACT] Online processing failed for {uuid}, falling back to batch: {e}")
+        del ocr_content
+
+    if ocr_texts is None:
+        try:
+            gcs_uri = await upload_to_gcs(upload, filename, uid, uuid)
+            logger.info(f"[ANALYZE PDF] Uploaded {filename} to GCS URI: {gcs_uri}")
+            batch_result = await process_document_batch(gcs_uri, len(page_texts))
+        except Exception as e:
+            if len(ocr_pages) == len(page_texts):
+                raise
+            # The text-layer pages are still usable; the OCR pages stay empty
+            logger.warning(f"[EXTRACT] OCR failed for {uuid}, keeping {len(page_texts) - len(ocr_pages)} text-layer pages: {e}")
+            doc_result = build_doc_result(page_texts)
+            doc_result["incomplete"] = True
+            return doc_result
+        ocr_texts = [batch_result["page_texts"][i] if i < len(batch_result["page_texts"]) else "" for i in ocr_pages]
+        ocr_document = batch_result["document"]
+
+    if len(ocr_texts) != len(ocr_pages):
+        # Page layout did not line up; keep all OCR text rather than dropping it
+        ocr_texts = ["\n".join(ocr_texts)] + [""] * (len(ocr_pages) - 1)
+    for page_number, text in zip(ocr_pages, ocr_texts):
+        page_texts[page_number] = text
+    doc_result = build_doc_result(page_texts)
+    doc_result["document"] = ocr_document
+    return doc_result
+
+GROQ_MODEL = "llama-3.3-70b-versatile"
+GROQ_TEMPERATURE = 0.3
+GROQ_MAX_TOKENS = 1000
+GROQ_TEXT_LIMIT = 4000
+
+# Long documents: map topic extraction over page-aligned chunks, then reduce to 5 topics
+GROQ_CHUNKED_ANALYSIS = os.getenv("GROQ_CHUNKED_ANALYSIS", "true").lower() in ("1", "true", "yes")
+GROQ_CHUNK_CONCURRENCY = int(os.getenv("GROQ_CHUNK_CONCURRENCY", "3"))
+GROQ_CHUNK_BUDGET_FACTOR = float(os.getenv("GROQ_CHUNK_BUDGET_FACTOR", "1.5"))
+GROQ_MAX_CHUNKS = int(os.getenv("GROQ_MAX_CHUNKS", "8"))
+
+# Streaming: topics are parsed from the reply as it arrives and handed to the resource search
+# one by one. An unusable reply is sent back with a repair prompt up to GROQ_REPAIR_ATTEMPTS times.
+GROQ_STREAMING = os.getenv("GROQ_STREAMING", "true").lower() in ("1", "true", "yes")
+GROQ_REPAIR_ATTEMPTS = int(os.getenv("GROQ_REPAIR_ATTEMPTS", "2"))
+GROQ_MAX_TOPICS = 5
+
+TOPICS_PROMPT = """
         Analyze this text and extract exactly 5 main topics. For each topic, provide:
         1. Topic name (clear and concise)
         2. Brief description (1-2 sentences)
         3. Keywords (3-5 relevant search terms)
 
-        Text: {text[:4000]}
+        Text: {text}
 
         Format the response as JSON:
         {{
@@ -208,72 +452,327 @@ async def analyze_with_groq(text: str) -> Dict:
         }}
         """
 
-        completion = groq_client.chat.completions.create(
-            messages=[{"role": "user", "content": prompt}],
-            model="llama-3.3-70b-versatile",
-            temperature=0.3,
-            max_tokens=1000,
-            stream=False
-        )
+MERGE_TOPICS_PROMPT = """
+        These topics were extracted from different sections of the same document:
+
+        {topics}
+
+        Merge duplicate or overlapping topics and return exactly 5 topics that best cover the
+        whole document. For each topic, provide:
+        1. Topic name (clear and concise)
+        2. Brief description (1-2 sentences)
+        3. Keywords (3-5 relevant search terms)
+
+        Format the response as JSON:
+        {{
+            "topics": [
+                {{
+                    "name": "Topic name",
+                    "description": "Brief description of the topic",
+                    "keywords": ["keyword1", "keyword2", "keyword3"]
+                }}
+            ]
+        }}
+        """
+
+REPAIR_PROMPT = """
+        Your previous reply could not be used: {error}
+
+        Reply again with only the JSON object, no other text, in this format:
+        {{
+            "topics": [
+                {{
+                    "name": "Topic name",
+                    "description": "Brief description of the topic",
+                    "keywords": ["keyword1", "keyword2", "keyword3"]
+                }}
+            ]
+        }}
+        """
+
+def llm_fallback() -> Dict:
+    return {
+        "topics": [{
+            "name": "Error analyzing text",
+            "description": "Failed to process document",
+            "keywords": ["error"]
+        }]
+    }
+
+TopicCallback = Callable[[Dict], None]
+
+# Stream one chat completion, yielding content as it arrives. The blocking SDK iterator is drained
+# on the blocking pool; it stops reading (and closes the stream) once the consumer goes away.
+async def stream_completion(messages: List[Dict]) -> AsyncIterator[str]:
+    loop = asyncio.get_running_loop()
+    deltas: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+
+    def put(content: Optional[str]) -> None:
+        try:
+            loop.call_soon_threadsafe(deltas.put_nowait, content)
+        except RuntimeError:
+            stop.set()  # event loop already closed
 
-        response = completion.choices[0].message.content
-        cleaned_content = extract_json(response)
-        return json.loads(cleaned_content)
+    def drain() -> None:
+        try:
+            stream = groq_client.chat.completions.create(
+                messages=messages,
+                model=GROQ_MODEL,
+                temperature=GROQ_TEMPERATURE,
+                max_tokens=GROQ_MAX_TOKENS,
+                stream=True
+            )
+            try:
+                for chunk in stream:
+                    if stop.is_set():
+                        break
+                    content = chunk.choices[0].delta.content if chunk.choices else None
+                    if content:
+                        put(content)
+            finally:
+                if hasattr(stream, "close"):
+                    stream.close()
+        finally:
+            put(None)
+
+    drained = asyncio.ensure_future(run_blocking(drain))
+    drained.add_done_callback(lambda f: f.cancelled() or f.exception())
+    try:
+        while True:
+            content = await deltas.get()
+            if content is None:
+                break
+            yield content
+        await drained
+    finally:
+        stop.set()
+
+async def complete_text(messages: List[Dict]) -> str:
+    completion = await run_blocking(
+        groq_client.chat.completions.create,
+        messages=messages,
+        model=GROQ_MODEL,
+        temperature=GROQ_TEMPERATURE,
+        max_tokens=GROQ_MAX_TOKENS,
+        stream=False
+    )
+    return completion.choices[0].message.content
+
+# Read one reply into a topics parser. A parse error stops reading and is left on the parser;
+# transport errors propagate so the provider layer can retry the whole reply.
+async def read_topics_reply(messages: List[Dict], on_topic: Optional[TopicCallback], emitted: set) -> TopicStreamParser:
+    parser = TopicStreamParser(max_topics=GROQ_MAX_TOPICS)
+    try:
+        if GROQ_STREAMING:
+            async with aclosing(stream_completion(messages)) as contents:
+                async for content in contents:
+                    for topic in parser.feed(content):
+                        if on_topic and topic["name"] not in emitted:
+                            emitted.add(topic["name"])
+                            on_topic(topic)
+                    if parser.full():
+                        break
+        else:
+            parser.feed(await complete_text(messages))
+    except TopicParseError:
+        pass
+    return parser
+
+# Run one topics prompt through Groq and parse the topics from the reply. With streaming, each
+# topic is passed to on_topic as soon as it is complete; topics already passed are not repeated.
+async def complete_topics(prompt: str, on_topic: Optional[TopicCallback] = None) -> Dict:
+    messages = [{"role": "user", "content": prompt}]
+    emitted = set()
+    partial: List[Dict] = []
+    for attempt in range(GROQ_REPAIR_ATTEMPTS + 1):
+        parser = await providers["groq"].call(read_topics_reply, messages, on_topic, emitted)
+        try:
+            return {"topics": parser.finish()}
+        except TopicParseError as e:
+            logger.warning(f"[LLM] Unusable topics reply (attempt {attempt + 1} of {GROQ_REPAIR_ATTEMPTS + 1}): {e}")
+            partial = parser.topics or partial
+            messages = messages[:1] + [
+                {"role": "assistant", "content": parser.text},
+                {"role": "user", "content": REPAIR_PROMPT.format(error=e)}
+            ]
+    if partial:
+        logger.warning(f"[LLM] Repair attempts exhausted, keeping {len(partial)} parsed topics")
+        return {"topics": partial}
+    raise TopicParseError(f"No usable topics after {GROQ_REPAIR_ATTEMPTS} repair attempts")
+
+# Map-reduce over the most salient chunks of a long document
+async def analyze_chunked(text: str, page_texts: Optional[List[str]], on_topic: Optional[TopicCallback] = None) -> Dict:
+    chunks = split_into_chunks(text, page_texts, GROQ_TEXT_LIMIT)
+    selected = select_chunks(chunks, chunk_budget(len(chunks), GROQ_CHUNK_BUDGET_FACTOR, GROQ_MAX_CHUNKS))
+    logger.info(f"[LLM] Chunked analysis: {len(selected)} of {len(chunks)} chunks selected")
+
+    semaphore = asyncio.Semaphore(GROQ_CHUNK_CONCURRENCY)
+
+    # With a single chunk its topics are final, so they can be streamed out directly
+    async def map_chunk(chunk: str) -> Dict:
+        async with semaphore:
+            return await complete_topics(TOPICS_PROMPT.format(text=chunk), on_topic if len(selected) == 1 else None)
+
+    results = await asyncio.gather(*(map_chunk(chunk) for chunk in selected), return_exceptions=True)
+    candidates = []
+    for result in results:
+        if isinstance(result, Exception):
+            logger.warning(f"[LLM] Chunk analysis failed: {result}")
+            continue
+        candidates.extend(topic for topic in result.get("topics", []) if isinstance(topic, dict) and topic.get("name"))
+    if not candidates:
+        raise Exception("No topics extracted from any chunk")
+    if len(selected) == 1:
+        return {"topics": candidates[:5]}
+
+    try:
+        merged = await complete_topics(MERGE_TOPICS_PROMPT.format(topics=json.dumps(candidates)), on_topic)
+        if merged.get("topics"):
+            return {"topics": merged["topics"][:5]}
+    except Exception as e:
+        logger.warning(f"[LLM] Topic merge failed, deduplicating locally: {e}")
+    return {"topics": dedupe_topics(candidates)[:5]}
+
+# Extract key information using Groq LLM API
+async def analyze_with_groq(text: str, page_texts: Optional[List[str]] = None,
+                            on_topic: Optional[TopicCallback] = None) -> Dict:
+    try:
+        if GROQ_CHUNKED_ANALYSIS and len(text) > GROQ_TEXT_LIMIT:
+            return await analyze_chunked(text, page_texts, on_topic)
+        return await complete_topics(TOPICS_PROMPT.format(text=text[:GROQ_TEXT_LIMIT]), on_topic)
 
     except Exception as e:
         logger.error(f"Groq Error: {e}")
-        return {
-            "topics": [{
-                "name": "Error analyzing text",
-                "description": "Failed to process document",
-                "keywords": ["error"]
-            }]
-        }
+        return llm_fallback()
+
+TAVILY_SEARCH_DEPTH = "advanced"
+TAVILY_MAX_RESULTS = 3  # Get top 3 results per topic
+TAVILY_INCLUDE_DOMAINS = [
+    "coursera.org", "udemy.com", "edx.org",
+    "youtube.com", "github.com", "medium.com",
+    "dev.to", "arxiv.org", "scholar.google.com"
+]
+
+def search_fallback() -> Dict:
+    return {
+        "articles": [],
+        "videos": [],
+        "courses": [],
+        "topics": ["Error searching resources"]
+    }
+
+# Tavily results are cached per normalised query and shared by all uploads; identical queries
+# that are already in flight wait for that request instead of sending their own. The request runs
+# in a task of its own, so a job that stops waiting (its topic was dropped, or it was halted)
+# does not cancel it for the other jobs.
+search_cache = build_search_cache()
+search_inflight: Dict[str, asyncio.Task] = {}
+
+# One Tavily request; None when it failed
+async def fetch_tavily(search_query: str, topic_name: str, semaphore: asyncio.Semaphore) -> Optional[List[Dict]]:
+    headers = {
+        "Authorization": f"Bearer {TAVILY_API_KEY}",
+        "Content-Type": "application/json"
+    }
+
+    payload = {
+        "query": search_query,
+        "search_depth": TAVILY_SEARCH_DEPTH,
+        "max_results": TAVILY_MAX_RESULTS,
+        "include_domains": TAVILY_INCLUDE_DOMAINS
+    }
+
+    # The semaphore is held per attempt, not across retry backoff
+    async def post() -> httpx.Response:
+        async with semaphore:
+            response = await asyncio.wait_for(
+                get_http_client().post(TAVILY_URL, headers=headers, json=payload),
+                timeout=TAVILY_QUERY_TIMEOUT
+            )
+        if response.status_code in RETRYABLE_STATUS_CODES:
+            retry_after = response.headers.get("retry-after", "")
+            raise RetryableStatus("tavily", response.status_code, float(retry_after) if retry_after.isdigit() else None)
+        return response
+
+    try:
+        response = await providers["tavily"].call(post)
+    except Exception as e:
+        logger.warning(f"[TAVILY] Query for topic '{topic_name}' failed: {type(e).__name__}: {e}")
+        return None
+    if response.status_code != 200:
+        EXTERNAL_CALL_ERRORS.inc(provider="tavily", error=f"http_{response.status_code}")
+        logger.warning(f"[TAVILY] Query for topic '{topic_name}' returned HTTP {response.status_code}")
+        return None
+    return response.json().get("results", [])
+
+# Search Tavily for a single topic; failures only drop this topic's results
+async def search_topic(topic: Dict, semaphore: asyncio.Semaphore) -> List[Dict]:
+    topic_name = topic["name"]
+    keywords = topic["keywords"]
+
+    # Combine topic and keywords for better search
+    search_query = f"{topic_name} {' '.join(keywords)}"
+    key, tokens = normalize_query(topic_name, keywords)
+
+    async def fetch_shared() -> Optional[List[Dict]]:
+        try:
+            fetched = await fetch_tavily(search_query, topic_name, semaphore)
+            if fetched is not None:
+                search_cache.set(key, tokens, fetched)
+            return fetched
+        finally:
+            search_inflight.pop(key, None)
+
+    results = search_cache.get(key, tokens)
+    record_cache_lookup("search", results is not None)
+    if results is None:
+        fetch = search_inflight.get(key)
+        if fetch is None:
+            fetch = search_inflight[key] = asyncio.create_task(fetch_shared())
+        results = await asyncio.shield(fetch)
+
+    return [dict(result, topic=topic_name) for result in results or []]
+
+# Tavily searches for one job, keyed by topic name and keywords. Searches can be started while
+# the LLM is still generating later topics; ones the final topic list does not use are cancelled.
+class TopicSearches:
+    def __init__(self):
+        self.semaphore = asyncio.Semaphore(TAVILY_CONCURRENCY)
+        self.tasks: Dict[tuple, asyncio.Task] = {}
+
+    def start(self, topic: Dict) -> asyncio.Task:
+        key = (topic["name"], tuple(topic["keywords"]))
+        if key not in self.tasks:
+            self.tasks[key] = asyncio.create_task(search_topic(topic, self.semaphore))
+        return self.tasks[key]
+
+    async def results(self, topics: List[Dict]) -> List[List[Dict]]:
+        wanted = [self.start(topic) for topic in topics]
+        self.cancel(keep=wanted)
+        return await asyncio.gather(*wanted)
+
+    def cancel(self, keep: List[asyncio.Task] = ()) -> None:
+        for task in self.tasks.values():
+            if task not in keep and not task.done():
+                task.cancel()
 
 # Search for relevant resources using Tavily API
-async def search_resources(topics: List[Dict]) -> Dict:
+async def search_resources(topics: List[Dict], searches: Optional[TopicSearches] = None) -> Dict:
     try:
-        all_resources = []
-        
-        # Search for each topic and its keywords
-        for topic in topics[:5]:  # Limit to 5 topics
-            topic_name = topic["name"]
-            keywords = topic["keywords"]
-            
-            # Combine topic and keywords for better search
-            search_query = f"{topic_name} {' '.join(keywords)}"
-            
-            headers = {
-                "Authorization": f"Bearer {TAVILY_API_KEY}",
-                "Content-Type": "application/json"
-            }
-            
-            payload = {
-                "query": search_query,
-                "search_depth": "advanced",
-                "max_results": 3,  # Get top 3 results per topic
-                "include_domains": [
-                    "coursera.org", "udemy.com", "edx.org", 
-                    "youtube.com", "github.com", "medium.com",
-                    "dev.to", "arxiv.org", "scholar.google.com"
-                ]
-            }
-            
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    "https://api.tavily.com/search",
-                    headers=headers,
-                    json=payload
-                )
-                if response.status_code != 200:
-                    continue
-                    
-                results = response.json().get("results", [])
-                
-                for result in results:
-                    result["topic"] = topic_name
-                    all_resources.append(result)
-        
+        # Search all topics (limit 5) concurrently; results keep topic order
+        searches = searches or TopicSearches()
+        per_topic = await searches.results(topics[:5])
+        all_resources = [result for results in per_topic for result in results]
+
+        # The same URL often comes back for several topics: keep its best-scoring copy
+        unique_resources = {}
+        for r in all_resources:
+            url_key = normalize_url(r.get("url") or "")
+            if url_key not in unique_resources or r.get("score", 0) > unique_resources[url_key].get("score", 0):
+                unique_resources[url_key] = r
+        all_resources = list(unique_resources.values())
+
         # Only keep resources with score > 0.6 (60%)
         filtered_resources = [r for r in all_resources if r.get("score", 0) > 0.6]
         # Sort all resources by relevance score
@@ -281,7 +780,7 @@ async def search_resources(topics: List[Dict]) -> Dict:
         # Take top 10 most relevant resources
         top_resources = filtered_resources[:10]
 
-        logger.info("top_resources: ",top_resources)
+        logger.info(f"[RESOURCES] Selected {len(top_resources)} of {len(all_resources)} resources")
 
         # Improved classification logic
         def classify_resource(r):
@@ -299,216 +798,521 @@ async def search_resources(topics: List[Dict]) -> Dict:
         for r in top_resources:
             grouped[classify_resource(r)].append(r)
         grouped["topics"] = [t["name"] for t in topics]
-        logger.info(f"[RESOURCES] Grouped resources: {grouped}")
+        logger.debug(f"[RESOURCES] Grouped resources: {grouped}")
         return grouped
                 
     except Exception as e:
         logger.error(f"Tavily Error: {str(e)}")
-        return {
-            "articles": [],
-            "videos": [],
-            "courses": [],
-            "topics": ["Error searching resources"]
+        return search_fallback()
+
+# Cache versions: bump automatically whenever the prompt/model or the search configuration changes,
+# so that only the affected stage (and the ones after it) re-run.
+TOPICS_CACHE_VERSION = fingerprint(
+    TOPICS_PROMPT, GROQ_MODEL, GROQ_TEMPERATURE, GROQ_MAX_TOKENS, GROQ_TEXT_LIMIT,
+    GROQ_CHUNKED_ANALYSIS, GROQ_CHUNK_BUDGET_FACTOR, GROQ_MAX_CHUNKS, MERGE_TOPICS_PROMPT
+)
+RESOURCES_CACHE_VERSION = fingerprint(
+    TOPICS_CACHE_VERSION, TAVILY_SEARCH_DEPTH, TAVILY_MAX_RESULTS, TAVILY_INCLUDE_DOMAINS, "url-dedupe"
+)
+
+# The job result stays small: the extracted text lives in the artifact store and is served
+# page by page from the endpoints listed under "references"
+def build_result_dict(uuid: str, filename: str, digest: str, doc_result: dict, llm_analysis: dict, resources: dict) -> dict:
+    return {
+        "filename": filename,
+        "analysis": {
+            "pages": doc_result["pages"],
+            "topics": llm_analysis["topics"],
+            "resources": resources
+        },
+        "references": {
+            "artifact": digest,
+            "text": f"/api/analyze-pdf-text/{uuid}",
+            "document": f"/api/analyze-pdf-document/{uuid}"
         }
+    }
+
+# Write the page texts and, when OCR ran, the raw Document AI JSON (blocking)
+def save_artifacts(digest: str, doc_result: dict, document=None) -> None:
+    if document is not None:
+        artifact_store.put_json_text(digest, DOCUMENT, documentai.Document.to_json(document))
+    artifact_store.put_json(digest, PAGES, doc_result.get("page_texts") or [doc_result["text"]])
+
+# A failed artifact write only affects the text endpoints, so it does not fail the job
+async def store_artifacts(digest: str, doc_result: dict, document=None) -> None:
+    try:
+        await run_blocking(save_artifacts, digest, doc_result, document)
+    except Exception as e:
+        logger.error(f"[ARTIFACTS] Failed to store artifacts for {digest[:12]}: {str(e)}")
+
+# Artifacts are content-addressed, so results served from the cache usually have them already
+async def ensure_artifacts(digest: str, doc_result: dict) -> None:
+    try:
+        exists = await run_blocking(artifact_store.exists, digest, PAGES)
+    except Exception as e:
+        logger.error(f"[ARTIFACTS] Failed to check artifacts for {digest[:12]}: {str(e)}")
+        return
+    if not exists:
+        await store_artifacts(digest, doc_result)
 
 
 # --- PDF PROCESSING STATUS AND RESULTS ---
 from typing import Optional
 
-processing_status = {}  # uuid: {status: str, result: dict|None, error: str|None}
+# Job state shared across workers: uuid -> {status: str, result: dict|None, error: str|None}
+job_store = build_job_store()
+
+# Progress events for /api/analyze-pdf-stream subscribers on this worker
+event_bus = JobEventBus()
+
+# Persist a job state change and push it to stream subscribers; the state records its owner
+async def update_job(uuid: str, uid: str, state: dict) -> None:
+    state = {**state, "uid": uid}
+    await job_store.set(uuid, state)
+    event_bus.publish(uuid, "result" if state.get("status") in FINISHED_STATUSES else "status", state)
+
+# State of a job owned by uid, None when there is no such job; other users' jobs are refused
+async def get_owned_job(uuid: str, uid: str) -> Optional[dict]:
+    state = await job_store.get(uuid)
+    if state is not None and state.get("uid") != uid:
+        logger.warning(f"[AUTH] User {uid} denied access to job {uuid}")
+        raise HTTPException(status_code=403, detail="This job belongs to another user.")
+    return state
+
+# Push a pipeline stage transition (upload, ocr, llm, search) to stream subscribers
+def emit_stage(uuid: str, stage: str, state: str, **details) -> None:
+    event_bus.publish(uuid, "stage", {"stage": stage, "state": state, **details})
+
+# Bounded pipeline queue + worker pool; admission control for analyze_pdf
+scheduler = build_scheduler()
+
+# Tasks running on this worker (asyncio tasks cannot be shared; cancellation goes through job_store)
+running_tasks = scheduler.running
+
+JOBS_IN_FLIGHT.set_function(lambda: len(running_tasks))
+JOBS_QUEUED.set_function(scheduler.queued_count)
+
+JOB_CANCEL_POLL_SECONDS = float(os.getenv("JOB_CANCEL_POLL_SECONDS", "1"))
+JOB_EVICT_INTERVAL_SECONDS = float(os.getenv("JOB_EVICT_INTERVAL_SECONDS", "60"))
+
+# Background loop: cancel local jobs halted from another worker and evict expired jobs
+async def job_maintenance_loop():
+    last_evict = time.time()
+    while True:
+        await asyncio.sleep(JOB_CANCEL_POLL_SECONDS)
+        try:
+            local_jobs = list(running_tasks) + scheduler.queued_uuids()
+            if local_jobs:
+                for uuid in await job_store.cancel_requested(local_jobs):
+                    task = running_tasks.pop(uuid, None)
+                    if task:
+                        task.cancel()
+                    if task or scheduler.cancel(uuid):
+                        logger.info(f"[HALT] Process {uuid} halted by a cancel request from another worker.")
+            if time.time() - last_evict >= JOB_EVICT_INTERVAL_SECONDS:
+                evicted = await job_store.evict_expired()
+                last_evict = time.time()
+                if evicted:
+                    logger.info(f"[JOBS] Evicted {evicted} expired jobs.")
+                evicted = await run_blocking(artifact_store.evict_expired)
+                if evicted:
+                    logger.info(f"[ARTIFACTS] Evicted {evicted} expired artifact sets.")
+        except Exception as e:
+            logger.error(f"[JOBS] Job maintenance failed: {str(e)}")
 
 @app.post("/api/analyze-pdf")
-async def analyze_pdf(request: Request, file: UploadFile):
-    start_time = time.time()
-    logger.info(f"[ANALYZE PDF] Request received: filename={file.filename if file else None}")
-    form = await request.form()
-    uuid = form.get("uuid")
+@endpoint_timer("analyze_pdf")
+async def analyze_pdf(request: Request, uid: str = Depends(get_uid_from_request)):
+    # The body is streamed to a spool file rather than parsed by FastAPI into memory
+    try:
+        upload = await receive_upload(request, "file", MAX_FILE_SIZE)
+    except UploadTooLarge as e:
+        logger.warning(f"[ANALYZE PDF] Rejected oversize upload: {str(e)}")
+        raise HTTPException(status_code=400, detail=f"File too large. Max size is {MAX_FILE_SIZE // (1024 * 1024)}MB.")
+    except UploadError as e:
+        logger.warning(f"[ANALYZE PDF] Malformed upload: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    logger.info(f"[ANALYZE PDF] Request received: filename={upload.filename}")
+    try:
+        return await start_analysis(upload, uid)
+    except BaseException:
+        upload.cleanup()
+        raise
+
+async def start_analysis(upload: SpooledUpload, uid: str) -> dict:
+    uuid = upload.fields.get("uuid")
     if not uuid:
         raise HTTPException(status_code=400, detail="Missing UUID")
+    # Rejected uploads leave no job state behind
+    if not upload.content_type == "application/pdf":
+        logger.warning(f"[ANALYZE PDF] Invalid file type: {upload.content_type}")
+        raise HTTPException(status_code=400, detail="Invalid file type. Only PDF files are supported.")
+    await get_owned_job(uuid, uid)
 
     # Cancel any previous task for this UUID
+    event_bus.reset(uuid)
     if uuid in running_tasks:
         running_tasks[uuid].cancel()
         del running_tasks[uuid]
         logger.info(f"[ANALYZE PDF] Previous task for uuid={uuid} cancelled.")
-    processing_status[uuid] = {"status": "processing", "result": None, "error": None}
+    elif scheduler.cancel(uuid):
+        logger.info(f"[ANALYZE PDF] Previous queued job for uuid={uuid} dropped.")
+    await update_job(uuid, uid, {"status": "processing", "result": None, "error": None})
 
-    if not file.content_type == "application/pdf":
-        logger.warning(f"[ANALYZE PDF] Invalid file type: {file.content_type}")
-        raise HTTPException(status_code=400, detail="Invalid file type. Only PDF files are supported.")
-    
-    content = await file.read()
-    if len(content) > MAX_FILE_SIZE:
-        logger.warning(f"[ANALYZE PDF] File too large by len(content): {len(content)}")
-        raise HTTPException(status_code=400, detail="File too large. Max size is 5MB.")
-    filename = file.filename
-    uid = await get_uid_from_request(request)
-    logger.info(f"[ANALYZE PDF] User {uid} uploading file {filename} (size={len(content)})")
+    filename = upload.filename
+    logger.info(f"[ANALYZE PDF] User {uid} uploading file {filename} (size={upload.size})")
+    PDF_BYTES.inc(upload.size)
+
+    # Fast path: every stage is already cached for these exact bytes (hashed while streaming)
+    digest = upload.sha256
+    cached_doc = await run_blocking(result_cache.get, digest, "text")
+    record_cache_lookup("text", cached_doc is not None)
+    cached_topics = cached_resources = None
+    if cached_doc:
+        cached_topics = await run_blocking(result_cache.get, digest, "topics", TOPICS_CACHE_VERSION)
+        record_cache_lookup("topics", cached_topics is not None)
+    if cached_topics:
+        cached_resources = await run_blocking(result_cache.get, digest, "resources", RESOURCES_CACHE_VERSION)
+        record_cache_lookup("resources", cached_resources is not None)
+    if cached_resources:
+        await ensure_artifacts(digest, cached_doc)
+        await update_job(uuid, uid, {
+            "status": "done",
+            "result": build_result_dict(uuid, filename, digest, cached_doc, cached_topics, cached_resources),
+            "error": None
+        })
+        logger.info(f"[CACHE] Full cache hit for uuid={uuid} (sha256={digest[:12]})")
+        upload.cleanup()
+        return {"success": True, "message": "PDF processing started."}
 
+    @stage_timer("total")
     async def process_pdf_task():
         try:
-            op_start = time.time()
-            gcs_uri = await upload_to_gcs(content, filename, uid, uuid)
-            logger.info(f"[ANALYZE PDF] Uploaded {filename} to GCS URI: {gcs_uri}")
-            await asyncio.sleep(0)
-            try:
-                doc_start = time.time()
-                doc_result = await process_document_batch(gcs_uri)
-                logger.info(f"[PERF] Document batch processed in {time.time() - doc_start:.2f}s")
-                await asyncio.sleep(0)
-            except Exception as e:
-                logger.error(f"[ERROR] Error processing PDF: {str(e)}\n{traceback.format_exc()}")
-                processing_status[uuid] = {"status": "failed", "result": None, "error": f"Error processing PDF: {str(e)}"}
+            if await job_store.cancel_requested([uuid]):
+                logger.info(f"[ANALYZE PDF] Job {uuid} was halted while queued, not starting.")
+                upload.cleanup()
                 return
+            await update_job(uuid, uid, {"status": "processing", "result": None, "error": None})
+        except BaseException:
+            # Cancelled while waiting on the job store: the try/finally below is not reached yet
+            upload.cleanup()
+            raise
+        bind_log_context(uuid=uuid)
+        # Each topic is searched as soon as the LLM has produced it
+        searches = TopicSearches()
+
+        def on_topic(topic: Dict) -> None:
+            searches.start(topic)
+            event_bus.publish(uuid, "topic", topic)
+
+        try:
+            doc_result = cached_doc
+            if doc_result:
+                logger.info(f"[CACHE] Text cache hit for uuid={uuid}, skipping upload and Document AI")
+                await ensure_artifacts(digest, doc_result)
+            else:
+                try:
+                    bind_log_context(stage="ocr")
+                    emit_stage(uuid, "ocr", "started")
+                    with stage_timer("ocr"):
+                        doc_result = await extract_document(upload, filename, uid, uuid)
+                    emit_stage(uuid, "ocr", "finished", pages=doc_result["pages"])
+                    PDF_PAGES.observe(doc_result["pages"])
+                    await store_artifacts(digest, doc_result, doc_result.pop("document", None))
+                    # Text missing its OCR pages is used for this job but not cached
+                    if not doc_result.pop("incomplete", False):
+                        await run_blocking(result_cache.set, digest, "text", doc_result)
+                    await asyncio.sleep(0)
+                except Exception as e:
+                    logger.error(f"[ERROR] Error processing PDF: {str(e)}\n{traceback.format_exc()}")
+                    await update_job(uuid, uid, {"status": "failed", "result": None, "error": f"Error processing PDF: {str(e)}"})
+                    return
+            llm_analysis = cached_topics
+            if llm_analysis:
+                logger.info(f"[CACHE] Topics cache hit for uuid={uuid}")
+            else:
+                try:
+                    bind_log_context(stage="llm")
+                    emit_stage(uuid, "llm", "started")
+                    with stage_timer("llm"):
+                        llm_analysis = await analyze_with_groq(doc_result["text"], doc_result.get("page_texts"), on_topic)
+                    if llm_analysis != llm_fallback():
+                        await run_blocking(result_cache.set, digest, "topics", llm_analysis, TOPICS_CACHE_VERSION)
+                    await asyncio.sleep(0)
+                except Exception as e:
+                    logger.error(f"[ERROR] Error in LLM analysis: {str(e)}\n{traceback.format_exc()}")
+                    llm_analysis = llm_fallback()
+            # Partial result: topics are available before the resource search finishes
+            event_bus.publish(uuid, "topics", {"topics": llm_analysis["topics"]})
             try:
-                llm_start = time.time()
-                llm_analysis = await analyze_with_groq(doc_result["text"])
-                logger.info(f"[PERF] LLM analysis completed in {time.time() - llm_start:.2f}s")
-                await asyncio.sleep(0)
-            except Exception as e:
-                logger.error(f"[ERROR] Error in LLM analysis: {str(e)}\n{traceback.format_exc()}")
-                llm_analysis = {"topics": [{"name": "Error analyzing text", "description": "Failed to process document", "keywords": ["error"]}]}
-            try:
-                search_start = time.time()
-                resources = await search_resources(llm_analysis["topics"])
-                logger.info(f"[PERF] Resource search completed in {time.time() - search_start:.2f}s")
+                bind_log_context(stage="search")
+                emit_stage(uuid, "search", "started")
+                with stage_timer("search"):
+                    resources = await search_resources(llm_analysis["topics"], searches)
+                emit_stage(uuid, "search", "finished")
+                if llm_analysis != llm_fallback() and resources != search_fallback():
+                    await run_blocking(result_cache.set, digest, "resources", resources, RESOURCES_CACHE_VERSION)
                 await asyncio.sleep(0)
             except Exception as e:
                 logger.error(f"[ERROR] Error searching resources: {str(e)}\n{traceback.format_exc()}")
-                resources = {"articles": [], "videos": [], "courses": [], "topics": ["Error searching resources"]}
-            logger.info(f"[PROCESSING] Extracted topics for {uuid}: {llm_analysis['topics']}")
-            logger.info(f"[PROCESSING] Extracted resources for {uuid}: {resources}")
-            result_dict = {
-                "filename": filename,
-                "analysis": {
-                    "text": doc_result["text"],
-                    "pages": doc_result["pages"],
-                    "topics": llm_analysis["topics"],
-                    "resources": resources
+                resources = search_fallback()
+            result_dict = build_result_dict(uuid, filename, digest, doc_result, llm_analysis, resources)
+            logger.info(
+                f"[PROCESSING] Saving result for {uuid}",
+                extra={
+                    "topics": [topic.get("name") for topic in llm_analysis["topics"]],
+                    "resources": {kind: len(resources.get(kind, [])) for kind in ("articles", "videos", "courses")}
                 }
-            }
-            logger.info(f"[PROCESSING] Saving result for {uuid}: {result_dict}")
-            processing_status[uuid] = {
+            )
+            await update_job(uuid, uid, {
                 "status": "done",
                 "result": result_dict,
                 "error": None
-            }
-            logger.info(f"[PERF] Total process_pdf_task time: {time.time() - op_start:.2f}s")
+            })
         except asyncio.CancelledError:
             logger.warning(f"[ANALYZE PDF] Processing for uuid={uuid} cancelled by user.")
-            # Attempt to delete the uploaded PDF from GCS on cancellation
-            try:
-                blob_name_upload = f"{uuid}/{filename}"
-                blob_upload = bucket.blob(blob_name_upload)
-                if blob_upload.exists():
-                    blob_upload.delete()
-                    logger.info(f"[CLEANUP] PDF {blob_name_upload} deleted from cloud storage after halt/cancel.")
-                else:
-                    logger.warning(f"[CLEANUP] No PDF found in storage to delete for {blob_name_upload} after halt/cancel.")
-            except Exception as e:
-                logger.error(f"[CLEANUP] Failed to delete PDF {uuid}/{filename} after halt/cancel: {str(e)}")
-            processing_status[uuid] = {"status": "cancelled", "result": None, "error": "Processing was cancelled."}
+            await update_job(uuid, uid, {"status": "cancelled", "result": None, "error": "Processing was cancelled."})
             raise
         except Exception as e:
             logger.error(f"[ERROR] Unexpected error in process_pdf_task: {str(e)}\n{traceback.format_exc()}")
-            processing_status[uuid] = {"status": "failed", "result": None, "error": str(e)}
+            await update_job(uuid, uid, {"status": "failed", "result": None, "error": str(e)})
         finally:
-            running_tasks.pop(uuid, None)
+            # The job's GCS objects are no longer needed, whatever the outcome
+            gcs_sweeper.release(uuid)
+            searches.cancel()
+            upload.cleanup()
 
-    task = asyncio.create_task(process_pdf_task())
-    running_tasks[uuid] = task
-    logger.info(f"[ANALYZE PDF] PDF processing started for uuid={uuid}")
-    logger.info(f"[PERF] analyze_pdf endpoint total time: {time.time() - start_time:.2f}s")
+    try:
+        position = scheduler.submit(uid, uuid, process_pdf_task)
+    except QueueFullError as e:
+        # Terminal state, so a client that only polls the status sees the rejection too
+        await update_job(uuid, uid, {"status": "failed", "result": None, "error": str(e), "status_code": 429, "retry_after": e.retry_after})
+        logger.warning(f"[ANALYZE PDF] Rejected uuid={uuid} for user {uid}: {str(e)} (retry after {e.retry_after}s)")
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    await update_job(uuid, uid, {"status": "queued", "result": None, "error": None, "queue_position": position})
+    logger.info(f"[ANALYZE PDF] PDF processing queued for uuid={uuid} at position {position}")
     return {"success": True, "message": "PDF processing started."}
 
 @app.get("/api/analyze-pdf-status/{uuid}")
-async def analyze_pdf_status(uuid: str):
-    status = processing_status.get(uuid)
+async def analyze_pdf_status(uuid: str, uid: str = Depends(get_uid_from_request)):
+    status = await get_owned_job(uuid, uid)
     if not status:
         logger.warning(f"[STATUS] No status found for {uuid}")
         return {"status": "not_found"}
-    logger.info(f"[STATUS] Returning status for {uuid}: {status}")
+    if status.get("status") == "queued":
+        # Live position when the job is queued on this worker
+        position = scheduler.position(uuid)
+        if position is not None:
+            status["queue_position"] = position
+    logger.debug(f"[STATUS] Returning status for {uuid}: {status.get('status')}")
     return status
 
+ARTIFACT_MAX_PAGE_SIZE = int(os.getenv("ARTIFACT_MAX_PAGE_SIZE", "50"))
+
+# Artifact key of the result of a finished job owned by uid
+async def job_artifact_digest(uuid: str, uid: str) -> str:
+    state = await get_owned_job(uuid, uid)
+    references = ((state or {}).get("result") or {}).get("references") or {}
+    if not references.get("artifact"):
+        raise HTTPException(status_code=404, detail="No result found for this uuid.")
+    return references["artifact"]
+
+# Extracted text of a finished job, one page range at a time
+@app.get("/api/analyze-pdf-text/{uuid}")
+@endpoint_timer("analyze_pdf_text")
+async def analyze_pdf_text(uuid: str, page: int = Query(1, ge=1), page_size: int = Query(10, ge=1),
+                           uid: str = Depends(get_uid_from_request)):
+    digest = await job_artifact_digest(uuid, uid)
+    page_texts = await run_blocking(artifact_store.get_json, digest, PAGES)
+    if page_texts is None:
+        logger.warning(f"[ARTIFACTS] Page texts missing for uuid={uuid}")
+        raise HTTPException(status_code=404, detail="Extracted text is no longer available.")
+    page_size = min(page_size, ARTIFACT_MAX_PAGE_SIZE)
+    start = (page - 1) * page_size
+    return {
+        "uuid": uuid,
+        "total_pages": len(page_texts),
+        "page": page,
+        "page_size": page_size,
+        "items": [{"page": start + i + 1, "text": text} for i, text in enumerate(page_texts[start:start + page_size])]
+    }
+
+# Raw Document AI output of a finished job, served in its stored gzip form
+@app.get("/api/analyze-pdf-document/{uuid}")
+@endpoint_timer("analyze_pdf_document")
+async def analyze_pdf_document(uuid: str, uid: str = Depends(get_uid_from_request)):
+    digest = await job_artifact_digest(uuid, uid)
+    data = await run_blocking(artifact_store.get, digest, DOCUMENT)
+    if data is None:
+        raise HTTPException(status_code=404, detail="No Document AI output for this uuid.")
+    return Response(content=data, media_type="application/json", headers={"Content-Encoding": "gzip"})
+
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
+SSE_STORE_POLL_SECONDS = float(os.getenv("SSE_STORE_POLL_SECONDS", "2"))
+
+# Server-Sent Events stream of stage, partial and final result events for one job
+@app.get("/api/analyze-pdf-stream/{uuid}")
+async def analyze_pdf_stream(uuid: str, request: Request, uid: str = Depends(get_uid_from_request)):
+    await get_owned_job(uuid, uid)
+
+    async def event_stream():
+        # Subscribe and snapshot the history in one step, before anything awaits or yields: events
+        # published after this point reach the queue only, so none is missed or sent twice
+        queue = event_bus.subscribe(uuid)
+        history = event_bus.history(uuid)
+        try:
+            state = await job_store.get(uuid)
+            if not state:
+                yield format_sse("result", {"status": "not_found"})
+                return
+            if state.get("status") in FINISHED_STATUSES:
+                yield format_sse("result", state)
+                return
+            yield format_sse("status", state)
+            for message in history:
+                yield format_sse(message["event"], message["data"])
+            last_sent = time.monotonic()
+            while True:
+                if await request.is_disconnected():
+                    return
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=SSE_STORE_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    # The job may be running on another worker: its final state lands in the store
+                    state = await job_store.get(uuid)
+                    if not state or state.get("status") in FINISHED_STATUSES:
+                        yield format_sse("result", state or {"status": "not_found"})
+                        return
+                    if time.monotonic() - last_sent >= SSE_KEEPALIVE_SECONDS:
+                        yield ": keep-alive\n\n"
+                        last_sent = time.monotonic()
+                    continue
+                yield format_sse(message["event"], message["data"])
+                last_sent = time.monotonic()
+                if message["event"] == "result":
+                    return
+        finally:
+            event_bus.unsubscribe(uuid, queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.delete("/api/delete-pdf")
-async def delete_pdf(request: Request):
-    start_time = time.time()
+@endpoint_timer("delete_pdf")
+async def delete_pdf(request: Request, uid: str = Depends(get_uid_from_request)):
     logger.info("[DELETE] Delete PDF request received")
     data = await request.json()
     uuid = data.get("uuid")
     filename = data.get("filename")
-    logger.info(f"[DELETE] filename: {filename}")
-    logger.info(f"[DELETE] uuid: {uuid}")
+    logger.info(f"[DELETE] uuid: {uuid}, filename: {filename}")
     if not filename:
         logger.warning("[DELETE] Missing filename in request")
         raise HTTPException(status_code=400, detail="Missing filename")
     if not uuid:
         logger.warning("[DELETE] Missing UUID in request")
         raise HTTPException(status_code=400, detail="Missing UUID")
-    blob_name_upload = f"{uuid}/{filename}"
-    blob_upload = bucket.blob(blob_name_upload)
-    if blob_upload.exists():
-        blob_upload.delete()
-        logger.info(f"[DELETE] PDF {blob_name_upload} deleted from cloud storage by user action.")
-        logger.info(f"[PERF] delete_pdf endpoint time: {time.time() - start_time:.2f}s")
-        return {"status": "deleted"}
-    else:
-        logger.warning(f"[DELETE] File not found in storage: {blob_name_upload}")
-        raise HTTPException(status_code=404, detail=f"File not found in {uuid}/{filename}")
+    # Deleted in the background. Uploads live under the owner's uid; the name without the prefix
+    # is the layout used by older uploads, which only the job state can tie to a user.
+    state = await get_owned_job(uuid, uid)
+    gcs_sweeper.delete(upload_blob_name(uid, uuid, filename))
+    if state is not None:
+        gcs_sweeper.delete(f"{uuid}/{filename}")
+    logger.info(f"[DELETE] PDF {uuid}/{filename} scheduled for deletion from cloud storage by user action.")
+    return JSONResponse(status_code=202, content={"status": "deletion_scheduled"})
 
 class HaltRequest(BaseModel):
     uuid: str
 
-# Dictionary to keep track of running tasks (for demonstration; in production use a proper task manager)
-running_tasks = {}
-
 @app.post("/api/halt_pdf_process")
-async def halt_pdf_process(request: Request):
-    start_time = time.time()
+@endpoint_timer("halt_pdf_process")
+async def halt_pdf_process(request: Request, uid: str = Depends(get_uid_from_request)):
     logger.info("[HALT] Halt PDF process request received")
     data = await request.json()
     uuid = data.get("uuid")
     if not uuid:
         logger.warning("[HALT] Missing UUID in halt request")
         raise HTTPException(status_code=400, detail="Missing UUID")
+    state = await get_owned_job(uuid, uid)
 
-    # Simulated process halting logic
-    # If you use asyncio tasks, celery, or subprocesses, you should implement actual cancellation here
+    # Cancel directly if the task runs on this worker, otherwise through the shared job store
     task = running_tasks.get(uuid)
     if task:
         try:
             task.cancel()
             del running_tasks[uuid]
-            processing_status[uuid] = {"status": "cancelled", "result": None, "error": "Processing was cancelled."}
+            await update_job(uuid, uid, {"status": "cancelled", "result": None, "error": "Processing was cancelled."})
             logger.info(f"[HALT] Process {uuid} halted by user action.")
-            logger.info(f"[PERF] halt_pdf_process endpoint time: {time.time() - start_time:.2f}s")
             return JSONResponse({"success": True, "message": f"Process {uuid} halted."})
         except Exception as e:
             logger.error(f"[HALT] Failed to halt process {uuid}: {str(e)}\n{traceback.format_exc()}")
             return JSONResponse({"success": False, "message": f"Failed to halt process: {str(e)}"})
-    else:
-        logger.warning(f"[HALT] No running process found for UUID: {uuid}")
-        return JSONResponse({"success": False, "message": "No running process found for this UUID."})
+    if scheduler.cancel(uuid):
+        await update_job(uuid, uid, {"status": "cancelled", "result": None, "error": "Processing was cancelled."})
+        logger.info(f"[HALT] Queued process {uuid} removed from the queue by user action.")
+        return JSONResponse({"success": True, "message": f"Process {uuid} halted."})
+    if state and state.get("status") in ("queued", "processing"):
+        # Running on another worker: flag it, the owning worker cancels the task
+        await job_store.request_cancel(uuid)
+        await update_job(uuid, uid, {"status": "cancelled", "result": None, "error": "Processing was cancelled."})
+        logger.info(f"[HALT] Cancel requested for process {uuid} running on another worker.")
+        return JSONResponse({"success": True, "message": f"Process {uuid} halted."})
+    logger.warning(f"[HALT] No running process found for UUID: {uuid}")
+    return JSONResponse({"success": False, "message": "No running process found for this UUID."})
+
+# Client-originated log events: size-capped, rate limited per user (per client address for signed-out
+# users or an invalid token) and logged as structured records
+USER_ACTION_LOG_PER_MINUTE = float(os.getenv("USER_ACTION_LOG_PER_MINUTE", "60"))
+USER_ACTION_LOG_BURST = int(os.getenv("USER_ACTION_LOG_BURST", "20"))
+USER_ACTION_LOG_MAX_BYTES = int(os.getenv("USER_ACTION_LOG_MAX_BYTES", str(16 * 1024)))
+USER_ACTION_LEVELS = {
+    "alert": logging.CRITICAL,
+    "error": logging.ERROR,
+    "warning": logging.WARNING,
+    "info": logging.INFO,
+    "debug": logging.INFO,
+}
+user_action_limiter = KeyedRateLimiter(USER_ACTION_LOG_PER_MINUTE, USER_ACTION_LOG_BURST)
+user_action_logger = logging.getLogger("user_action")
 
 @app.post("/api/log_user_action")
 async def log_user_action(request: Request):
-    data = await request.json()
-    level = (data.get('level') or 'info').lower()
-    action = data.pop('action', 'UNKNOWN ACTION') 
-    msg = f"{action} {data}" 
-    if level == 'alert':
-        logger.critical(msg)
-    elif level == 'error':
-        logger.error(msg)
-    elif level == 'warning':
-        logger.warning(msg)
-    elif level == 'debug':
-        logger.info(msg)
-    else:
-        logger.info(msg)
+    id_token = request.headers.get("x-firebase-token")
+    uid = token_verifier.cached_uid(id_token) if id_token else None
+    if id_token and uid is None:
+        try:
+            uid = await run_blocking(token_verifier.verify, id_token)
+        except InvalidToken as e:
+            logger.warning(f"[AUTH] Invalid token on log event, limiting by client address: {e}")
+    client = f"uid:{uid}" if uid else f"ip:{request.client.host if request.client else 'unknown'}"
+    if not user_action_limiter.allow(client):
+        return JSONResponse(status_code=429, content={"success": False, "error": "Too many log events"})
+    if int(request.headers.get("content-length") or 0) > USER_ACTION_LOG_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="Log event too large")
+    body = await request.body()
+    try:
+        data = json.loads(body) if len(body) <= USER_ACTION_LOG_MAX_BYTES else None
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        raise HTTPException(status_code=400, detail="Expected a JSON object of at most "
+                                                    f"{USER_ACTION_LOG_MAX_BYTES} bytes")
+    level = USER_ACTION_LEVELS.get(str(data.pop("level", None) or "info").lower(), logging.INFO)
+    action = truncate(str(data.pop("action", "UNKNOWN ACTION")), 200)
+    user_action_logger.log(level, action, extra={"event": "user_action", "client": client, "fields": data})
     return {"success": True}
 
+# Prometheus text exposition of the pipeline metrics
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 @app.get("/api/health")
 async def health_check():
-    logger.info("[HEALTH] Health check endpoint accessed.")
-    return {"status": "healthy"}
+    logger.debug("[HEALTH] Health check endpoint accessed.")
+    # A degraded provider is reported but still answers 200, so the instance is not restarted for it
+    breakers = {name: provider.breaker.snapshot() for name, provider in providers.items()}
+    degraded = any(breaker["state"] != "closed" for breaker in breakers.values())
+    return {"status": "degraded" if degraded else "healthy", "providers": breakers}
@@ -0,0 +1,256 @@
+import asyncio
+import functools
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Minimal Prometheus-style metrics (counters, gauges, histograms) rendered in the text
+# exposition format at /metrics. Recording is a dict lookup and a few additions under a lock,
+# so it is cheap enough for the request hot path.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    # Evaluate the gauge lazily at scrape time (unlabelled gauges only)
+    def set_function(self, function: Callable[[], float]) -> None:
+        self._function = function
+
+    def samples(self) -> List[str]:
+        if self._function is not None:
+            return [f"{self.name} {_format_value(self._function())}"]
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series: Dict[Tuple[str, ...], list] = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def time(self, **labels) -> "Timer":
+        return Timer(self, labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._series.items()]
+        lines = []
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {_format_value(cumulative)}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{labels} {_format_value(series[-1])}")
+        return lines
+
+
+# Times a block or a function (sync or async) into a histogram; optionally counts exceptions
+class Timer:
+    def __init__(self, histogram: Histogram, labels: Dict[str, str], errors: Optional[Counter] = None):
+        self.histogram = histogram
+        self.labels = labels
+        self.errors = errors
+        self.elapsed = 0.0
+        self._start = 0.0
+
+    def __enter__(self) -> "Timer":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.elapsed = time.perf_counter() - self._start
+        self.histogram.observe(self.elapsed, **self.labels)
+        if exc_type is not None and self.errors is not None and not issubclass(exc_type, asyncio.CancelledError):
+            self.errors.inc(error=exc_type.__name__, **self.labels)
+        return False
+
+    def __call__(self, func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with Timer(self.histogram, self.labels, self.errors):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with Timer(self.histogram, self.labels, self.errors):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+PIPELINE_STAGE_SECONDS = REGISTRY.register(Histogram(
+    "pipeline_stage_seconds", "Latency of each analyze_pdf pipeline stage.", ("stage",)
+))
+EXTERNAL_CALL_SECONDS = REGISTRY.register(Histogram(
+    "external_call_seconds", "Latency of calls to external providers.", ("provider",)
+))
+EXTERNAL_CALL_ERRORS = REGISTRY.register(Counter(
+    "external_call_errors_total", "Failed calls to external providers by error type.", ("provider", "error")
+))
+ENDPOINT_SECONDS = REGISTRY.register(Histogram(
+    "endpoint_seconds", "Handler latency of the API endpoints.", ("endpoint",)
+))
+PDF_BYTES = REGISTRY.register(Counter(
+    "pdf_bytes_processed_total", "Bytes of uploaded PDFs accepted for processing."
+))
+PDF_PAGES = REGISTRY.register(Histogram(
+    "pdf_pages", "Pages per processed document.", buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500)
+))
+DOCUMENT_AI_BATCH_DOCUMENTS = REGISTRY.register(Histogram(
+    "document_ai_batch_documents", "Documents per Document AI batch operation.", buckets=(1, 2, 4, 8, 16, 32, 50)
+))
+# The long-running operation is kept out of external_call_seconds, which times the RPCs themselves
+DOCUMENT_AI_OPERATION_SECONDS = REGISTRY.register(Histogram(
+    "document_ai_operation_seconds", "Wait for Document AI batch operations to complete, by outcome.", ("outcome",),
+    buckets=(5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+))
+DOCUMENT_AI_OPERATIONS_IN_FLIGHT = REGISTRY.register(Gauge(
+    "document_ai_operations_in_flight", "Document AI long-running operations being polled."
+))
+EXTERNAL_CALL_RETRIES = REGISTRY.register(Counter(
+    "external_call_retries_total", "Retried calls to external providers.", ("provider",)
+))
+CIRCUIT_BREAKER_STATE = REGISTRY.register(Gauge(
+    "circuit_breaker_state", "Circuit breaker state per provider (0 closed, 1 half-open, 2 open).", ("provider",)
+))
+LOG_RECORDS_DROPPED = REGISTRY.register(Counter(
+    "log_records_dropped_total", "Log records dropped because the logging queue was full."
+))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "result_cache_requests_total", "Result cache lookups by stage and outcome (hit/miss).", ("stage", "result")
+))
+JOBS_IN_FLIGHT = REGISTRY.register(Gauge("jobs_in_flight", "Pipeline jobs currently running on this worker."))
+JOBS_QUEUED = REGISTRY.register(Gauge("jobs_queued", "Pipeline jobs waiting in this worker's queue."))
+
+
+def stage_timer(stage: str) -> Timer:
+    return PIPELINE_STAGE_SECONDS.time(stage=stage)
+
+
+def external_call(provider: str) -> Timer:
+    return Timer(EXTERNAL_CALL_SECONDS, {"provider": provider}, EXTERNAL_CALL_ERRORS)
+
+
+def endpoint_timer(endpoint: str) -> Timer:
+    return ENDPOINT_SECONDS.time(endpoint=endpoint)
+
+
+def record_cache_lookup(stage: str, hit: bool) -> None:
+    CACHE_REQUESTS.inc(stage=stage, result="hit" if hit else "miss")
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from typing import Optional, Set
+
+from executor import run_blocking
+
+logger = logging.getLogger(__name__)
+
+# Waits on many long-running operations (google.api_core Operation objects) from one background
+# loop instead of parking a thread in operation.result() per operation. Each operation is polled
+# with exponential backoff; a poll borrows a blocking-pool thread only for the single refresh RPC.
+# A waiter that is cancelled or times out cancels the remote operation as well.
+OPERATION_POLL_INITIAL_SECONDS = float(os.getenv("OPERATION_POLL_INITIAL_SECONDS", "1"))
+OPERATION_POLL_MAX_SECONDS = float(os.getenv("OPERATION_POLL_MAX_SECONDS", "15"))
+OPERATION_POLL_MULTIPLIER = float(os.getenv("OPERATION_POLL_MULTIPLIER", "1.5"))
+
+
+class OperationTimeout(Exception):
+    pass
+
+
+class _Watch:
+    def __init__(self, operation, future: asyncio.Future, deadline: float, delay: float):
+        self.operation = operation
+        self.future = future
+        self.deadline = deadline
+        self.delay = delay
+        self.next_poll = time.monotonic() + delay
+
+
+class OperationPoller:
+    def __init__(self, initial_delay: float, max_delay: float, multiplier: float):
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self._watches: Set[_Watch] = set()
+        self._cancels: Set[asyncio.Task] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for watch in self._watches:
+            watch.future.cancel()
+        self._watches.clear()
+        await asyncio.gather(*self._cancels, return_exceptions=True)
+
+    # Wait until the operation is done; raises OperationTimeout after `timeout` seconds
+    async def wait(self, operation, timeout: float) -> None:
+        future = asyncio.get_running_loop().create_future()
+        watch = _Watch(operation, future, time.monotonic() + timeout, self.initial_delay)
+        self._watches.add(watch)
+        self._wakeup.set()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if watch in self._watches:
+                self._watches.discard(watch)
+                self._cancel_remote(operation, "waiter cancelled")
+            raise
+
+    def in_flight(self) -> int:
+        return len(self._watches)
+
+    def _cancel_remote(self, operation, reason: str) -> None:
+        async def cancel():
+            try:
+                await run_blocking(operation.cancel)
+                logger.info(f"[OPERATIONS] Cancelled {operation.operation.name} ({reason})")
+            except Exception as e:
+                logger.warning(f"[OPERATIONS] Could not cancel {operation.operation.name}: {e}")
+
+        task = asyncio.create_task(cancel())
+        self._cancels.add(task)
+        task.add_done_callback(self._cancels.discard)
+
+    async def _poll(self, watch: _Watch) -> None:
+        if watch.future.done():
+            self._watches.discard(watch)
+            return
+        try:
+            done = await run_blocking(watch.operation.done)
+        except Exception as e:
+            # Refresh failures are treated as "not done yet" and retried with backoff
+            logger.warning(f"[OPERATIONS] Polling {watch.operation.operation.name} failed: {e}")
+            done = False
+        if watch not in self._watches:
+            return
+        now = time.monotonic()
+        if done:
+            self._watches.discard(watch)
+            if not watch.future.done():
+                watch.future.set_result(None)
+        elif now >= watch.deadline:
+            self._watches.discard(watch)
+            self._cancel_remote(watch.operation, "timed out")
+            if not watch.future.done():
+                watch.future.set_exception(OperationTimeout(f"Operation {watch.operation.operation.name} timed out"))
+        else:
+            watch.delay = min(watch.delay * self.multiplier, self.max_delay)
+            watch.next_poll = min(now + watch.delay * random.uniform(0.8, 1.2), watch.deadline)
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                now = time.monotonic()
+                due = [watch for watch in self._watches if watch.next_poll <= now]
+                if due:
+                    await asyncio.gather(*(self._poll(watch) for watch in due))
+                self._wakeup.clear()
+                if self._watches:
+                    sleep = max(0.0, min(watch.next_poll for watch in self._watches) - time.monotonic())
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=sleep)
+                    except asyncio.TimeoutError:
+                        pass
+                else:
+                    await self._wakeup.wait()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[OPERATIONS] Poller loop error: {str(e)}")
+                await asyncio.sleep(1)
+
+
+def build_operation_poller() -> OperationPoller:
+    return OperationPoller(OPERATION_POLL_INITIAL_SECONDS, OPERATION_POLL_MAX_SECONDS, OPERATION_POLL_MULTIPLIER)
@@ -0,0 +1,263 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from typing import Dict, Optional
+
+import groq
+import httpx
+import requests
+from google.api_core import exceptions as google_exceptions
+
+from metrics import CIRCUIT_BREAKER_STATE, EXTERNAL_CALL_ERRORS, EXTERNAL_CALL_RETRIES, external_call
+
+logger = logging.getLogger(__name__)
+
+# Shared call layer for the external providers (GCS, Document AI, Groq, Tavily). Every call
+# takes a token from the provider's rate limiter, is retried with jittered exponential backoff
+# on transient errors, and goes through a circuit breaker that fails fast while the provider
+# keeps failing, so a degraded provider does not tie up the worker with hung retries.
+EXTERNAL_RETRY_MAX_ATTEMPTS = int(os.getenv("EXTERNAL_RETRY_MAX_ATTEMPTS", "3"))
+EXTERNAL_RETRY_BASE_SECONDS = float(os.getenv("EXTERNAL_RETRY_BASE_SECONDS", "0.5"))
+EXTERNAL_RETRY_MAX_SECONDS = float(os.getenv("EXTERNAL_RETRY_MAX_SECONDS", "8"))
+EXTERNAL_BREAKER_FAILURES = int(os.getenv("EXTERNAL_BREAKER_FAILURES", "5"))
+EXTERNAL_BREAKER_RESET_SECONDS = float(os.getenv("EXTERNAL_BREAKER_RESET_SECONDS", "30"))
+# Longest a call waits for its rate-limit token; past that it fails fast with RateLimitExceeded
+EXTERNAL_RATE_LIMIT_MAX_WAIT_SECONDS = float(os.getenv("EXTERNAL_RATE_LIMIT_MAX_WAIT_SECONDS", "20"))
+
+# Default request quotas per minute (0 disables limiting): Groq's free-tier limit for
+# llama-3.3-70b-versatile, Tavily's development key limit, Document AI's default online
+# processing quota. GCS has no fixed request quota; its limit only smooths bursts.
+PROVIDER_RATE_DEFAULTS = {
+    "gcs": (3000, 100),
+    "document_ai": (120, 10),
+    "groq": (30, 5),
+    "tavily": (100, 10),
+}
+
+RETRYABLE_STATUS_CODES = frozenset((408, 429, 500, 502, 503, 504))
+
+RETRYABLE_ERRORS = (
+    asyncio.TimeoutError,
+    httpx.TimeoutException,
+    httpx.TransportError,
+    requests.ConnectionError,
+    requests.Timeout,
+    google_exceptions.TooManyRequests,
+    google_exceptions.InternalServerError,
+    google_exceptions.BadGateway,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.GatewayTimeout,
+    google_exceptions.DeadlineExceeded,
+    groq.APIConnectionError,
+    groq.RateLimitError,
+    groq.InternalServerError,
+)
+
+# Errors after which the request may still have been carried out; calls that are not idempotent
+# (they start an operation) are not retried on these
+MAYBE_EXECUTED_ERRORS = (
+    asyncio.TimeoutError,
+    httpx.TimeoutException,
+    requests.Timeout,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.GatewayTimeout,
+)
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(f"{provider} is unavailable (circuit open, retry in {retry_after:.0f}s)")
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+# Raised instead of queueing behind the rate limiter for longer than the provider's max wait
+class RateLimitExceeded(Exception):
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(f"{provider} rate limit reached (retry in {retry_after:.0f}s)")
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+# Raised for an HTTP response whose status is worth retrying
+class RetryableStatus(Exception):
+    def __init__(self, provider: str, status_code: int, retry_after: Optional[float] = None):
+        super().__init__(f"{provider} returned HTTP {status_code}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def is_retryable(error: BaseException) -> bool:
+    return isinstance(error, (RetryableStatus,) + RETRYABLE_ERRORS)
+
+
+# Token bucket; callers reserve a token and sleep until it is theirs, so waiters are served in order.
+# A caller that would wait longer than max_wait gets RateLimitExceeded and reserves nothing.
+class TokenBucket:
+    def __init__(self, name: str, rate_per_second: float, burst: int, max_wait: float):
+        self.name = name
+        self.rate = rate_per_second
+        self.burst = max(1, burst)
+        self.max_wait = max_wait
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        wait = (1 - self.tokens) / self.rate
+        if wait > self.max_wait:
+            raise RateLimitExceeded(self.name, wait)
+        self.tokens -= 1
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+
+
+class CircuitBreaker:
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self._publish()
+
+    # Raises CircuitOpenError while open; after reset_seconds one probe call is let through
+    def before_call(self) -> None:
+        if self.state == self.OPEN:
+            remaining = self.opened_at + self.reset_seconds - time.monotonic()
+            if remaining > 0:
+                raise CircuitOpenError(self.name, remaining)
+            self._set_state(self.HALF_OPEN)
+        if self.state == self.HALF_OPEN:
+            if self.probing:
+                raise CircuitOpenError(self.name, self.reset_seconds)
+            self.probing = True
+
+    def record_success(self) -> None:
+        self.probing = False
+        self.failures = 0
+        if self.state != self.CLOSED:
+            self._set_state(self.CLOSED)
+
+    def record_failure(self) -> None:
+        self.probing = False
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self._set_state(self.OPEN)
+
+    # Outcome unknown (the call was cancelled): just free the probe slot
+    def release(self) -> None:
+        self.probing = False
+
+    def _set_state(self, state: str) -> None:
+        if state != self.state:
+            log = logger.warning if state == self.OPEN else logger.info
+            log(f"[RESILIENCE] {self.name} circuit {self.state} -> {state} after {self.failures} consecutive failures")
+        self.state = state
+        self._publish()
+
+    def _publish(self) -> None:
+        CIRCUIT_BREAKER_STATE.set((self.CLOSED, self.HALF_OPEN, self.OPEN).index(self.state), provider=self.name)
+
+    def snapshot(self) -> Dict:
+        snapshot = {"state": self.state, "consecutive_failures": self.failures}
+        if self.state == self.OPEN:
+            snapshot["retry_in_seconds"] = round(max(0.0, self.opened_at + self.reset_seconds - time.monotonic()), 1)
+        return snapshot
+
+
+class Provider:
+    def __init__(self, name: str, limiter: TokenBucket, breaker: CircuitBreaker, max_attempts: int,
+                 base_delay: float, max_delay: float):
+        self.name = name
+        self.limiter = limiter
+        self.breaker = breaker
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    # Await func(*args, **kwargs) (a coroutine function) under the provider's limits. Transient
+    # errors are retried; other errors are raised at once and do not count against the breaker.
+    async def call(self, func, *args, **kwargs):
+        return await self._call(func, args, kwargs, idempotent=True)
+
+    # Same, for calls that start something (e.g. a Document AI operation): errors after which the
+    # request may have gone through are raised instead of retried, so no duplicate is started
+    async def call_once(self, func, *args, **kwargs):
+        return await self._call(func, args, kwargs, idempotent=False)
+
+    async def _call(self, func, args, kwargs, idempotent: bool):
+        attempt = 0
+        while True:
+            attempt += 1
+            self.breaker.before_call()
+            try:
+                await self.limiter.acquire()
+            except RateLimitExceeded:
+                self.breaker.release()
+                EXTERNAL_CALL_ERRORS.inc(provider=self.name, error="RateLimitExceeded")
+                raise
+            except BaseException:
+                self.breaker.release()
+                raise
+            try:
+                with external_call(self.name):
+                    result = await func(*args, **kwargs)
+            except asyncio.CancelledError:
+                self.breaker.release()
+                raise
+            except Exception as e:
+                if not is_retryable(e):
+                    self.breaker.release()
+                    raise
+                self.breaker.record_failure()
+                if attempt >= self.max_attempts or self.breaker.state == CircuitBreaker.OPEN:
+                    raise
+                if not idempotent and isinstance(e, MAYBE_EXECUTED_ERRORS):
+                    logger.warning(f"[RESILIENCE] {self.name} call failed ({type(e).__name__}: {e}), not retried: it may have gone through")
+                    raise
+                delay = self.backoff(attempt, getattr(e, "retry_after", None))
+                EXTERNAL_CALL_RETRIES.inc(provider=self.name)
+                logger.warning(f"[RESILIENCE] {self.name} call failed ({type(e).__name__}: {e}), retry {attempt} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+
+    # Full jitter: uniform over [0, min(max, base * 2^(attempt-1))], at least any Retry-After
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        if retry_after:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+
+# Providers by name, configured from {NAME}_RATE_LIMIT_PER_MINUTE / {NAME}_RATE_LIMIT_BURST /
+# {NAME}_RATE_LIMIT_MAX_WAIT_SECONDS and the shared EXTERNAL_* retry and breaker settings
+def build_providers() -> Dict[str, Provider]:
+    providers = {}
+    for name, (per_minute, burst) in PROVIDER_RATE_DEFAULTS.items():
+        prefix = name.upper()
+        per_minute = float(os.getenv(f"{prefix}_RATE_LIMIT_PER_MINUTE", str(per_minute)))
+        burst = int(os.getenv(f"{prefix}_RATE_LIMIT_BURST", str(burst)))
+        max_wait = float(os.getenv(f"{prefix}_RATE_LIMIT_MAX_WAIT_SECONDS", str(EXTERNAL_RATE_LIMIT_MAX_WAIT_SECONDS)))
+        providers[name] = Provider(
+            name,
+            TokenBucket(name, per_minute / 60, burst, max_wait),
+            CircuitBreaker(name, EXTERNAL_BREAKER_FAILURES, EXTERNAL_BREAKER_RESET_SECONDS),
+            EXTERNAL_RETRY_MAX_ATTEMPTS,
+            EXTERNAL_RETRY_BASE_SECONDS,
+            EXTERNAL_RETRY_MAX_SECONDS,
+        )
+    return providers
@@ -0,0 +1,233 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Content-addressed cache for pipeline stage outputs.
+# Keys are "<sha256 of pdf>:<stage>:<stage version>", values are JSON-serialisable dicts.
+
+
+# Short stable fingerprint of whatever determines a stage's output (prompt, model, search config...)
+def fingerprint(*parts) -> str:
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+class CacheBackend:
+    def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: str) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+
+class NullBackend(CacheBackend):
+    def get(self, key: str) -> Optional[str]:
+        return None
+
+    def set(self, key: str, value: str) -> None:
+        pass
+
+    def delete(self, key: str) -> None:
+        pass
+
+
+# In-process LRU with a byte cap and TTL
+class MemoryLRUBackend(CacheBackend):
+    def __init__(self, max_bytes: int, ttl_seconds: float):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key: (expires_at, value)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.time() + self.ttl_seconds, value)
+            self._size += len(value)
+            while self._size > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        _, value = self._entries.pop(key)
+        self._size -= len(value)
+
+
+# On-disk SQLite store, shared by every worker on the host. The total size lives in a one-row
+# table kept up to date by triggers, in the same transaction as the change; reads only write
+# when the recorded access time is older than SQLITE_ACCESS_RESOLUTION_SECONDS; eviction deletes
+# the least recently used rows in bounded batches through the accessed_at index.
+SQLITE_ACCESS_RESOLUTION_SECONDS = float(os.getenv("RESULT_CACHE_ACCESS_RESOLUTION_SECONDS", "60"))
+SQLITE_EVICT_BATCH = int(os.getenv("RESULT_CACHE_EVICT_BATCH", "64"))
+
+
+class SQLiteBackend(CacheBackend):
+    def __init__(self, path: str, max_bytes: int, ttl_seconds: float):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # One transaction, so a worker opening the file concurrently never sees the triggers
+        # without a seeded total (or counts rows twice)
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS result_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS result_cache_accessed ON result_cache (accessed_at)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS result_cache_expires ON result_cache (expires_at)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS result_cache_size (id INTEGER PRIMARY KEY CHECK (id = 0), total INTEGER NOT NULL)"
+            )
+            self._conn.execute(
+                "INSERT OR IGNORE INTO result_cache_size (id, total) SELECT 0, COALESCE(SUM(size), 0) FROM result_cache"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS result_cache_size_insert AFTER INSERT ON result_cache BEGIN "
+                "UPDATE result_cache_size SET total = total + NEW.size WHERE id = 0; END"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS result_cache_size_delete AFTER DELETE ON result_cache BEGIN "
+                "UPDATE result_cache_size SET total = total - OLD.size WHERE id = 0; END"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS result_cache_size_update AFTER UPDATE OF size ON result_cache BEGIN "
+                "UPDATE result_cache_size SET total = total + NEW.size - OLD.size WHERE id = 0; END"
+            )
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at, accessed_at FROM result_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at, accessed_at = row
+            if expires_at < now:
+                self._conn.execute("DELETE FROM result_cache WHERE key = ?", (key,))
+                return None
+            if accessed_at < now - SQLITE_ACCESS_RESOLUTION_SECONDS:
+                self._conn.execute("UPDATE result_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        if len(value) > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            # An upsert rather than INSERT OR REPLACE: REPLACE deletes without firing the delete trigger
+            self._conn.execute(
+                "INSERT INTO result_cache (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, size = excluded.size, "
+                "expires_at = excluded.expires_at, accessed_at = excluded.accessed_at",
+                (key, value, len(value), now + self.ttl_seconds, now),
+            )
+            self._evict(now)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM result_cache WHERE key = ?", (key,))
+
+    def _evict(self, now: float) -> None:
+        self._conn.execute(
+            "DELETE FROM result_cache WHERE key IN "
+            "(SELECT key FROM result_cache WHERE expires_at < ? ORDER BY expires_at LIMIT ?)",
+            (now, SQLITE_EVICT_BATCH),
+        )
+        # Drop least recently used rows, a batch at a time, until we are back under the cap
+        total = self._conn.execute("SELECT total FROM result_cache_size WHERE id = 0").fetchone()[0]
+        while total > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM result_cache ORDER BY accessed_at ASC LIMIT ?", (SQLITE_EVICT_BATCH,)
+            ).fetchall()
+            if not rows:
+                break
+            stale = []
+            for key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                stale.append((key,))
+                total -= size
+            self._conn.executemany("DELETE FROM result_cache WHERE key = ?", stale)
+            total = self._conn.execute("SELECT total FROM result_cache_size WHERE id = 0").fetchone()[0]
+
+
+class ResultCache:
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+
+    @staticmethod
+    def key(digest: str, stage: str, version: str = "") -> str:
+        return f"{digest}:{stage}:{version}"
+
+    def get(self, digest: str, stage: str, version: str = "") -> Optional[dict]:
+        try:
+            raw = self.backend.get(self.key(digest, stage, version))
+            return json.loads(raw) if raw is not None else None
+        except Exception as e:
+            logger.error(f"[CACHE] Failed to read {stage} for {digest[:12]}: {e}")
+            return None
+
+    def set(self, digest: str, stage: str, value: dict, version: str = "") -> None:
+        try:
+            self.backend.set(self.key(digest, stage, version), json.dumps(value))
+        except Exception as e:
+            logger.error(f"[CACHE] Failed to write {stage} for {digest[:12]}: {e}")
+
+
+# Build the cache from RESULT_CACHE_* environment variables
+def build_result_cache() -> ResultCache:
+    kind = os.getenv("RESULT_CACHE_BACKEND", "memory").lower()
+    max_bytes = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+    ttl_seconds = float(os.getenv("RESULT_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+    if kind == "sqlite":
+        path = os.getenv("RESULT_CACHE_PATH", "cache/results.sqlite3")
+        backend = SQLiteBackend(path, max_bytes, ttl_seconds)
+    elif kind == "none":
+        backend = NullBackend()
+    else:
+        backend = MemoryLRUBackend(max_bytes, ttl_seconds)
+    logger.info(f"[CACHE] Result cache backend: {type(backend).__name__}")
+    return ResultCache(backend)
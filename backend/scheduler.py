@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Bounded pipeline queue with a fixed pool of workers. Jobs are queued per Firebase UID and
+# dequeued round-robin across users, so one user's burst cannot starve everyone else.
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", "4"))
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "50"))
+PIPELINE_QUEUE_PER_USER = int(os.getenv("PIPELINE_QUEUE_PER_USER", "5"))
+PIPELINE_EXPECTED_JOB_SECONDS = float(os.getenv("PIPELINE_EXPECTED_JOB_SECONDS", "30"))
+
+JobFactory = Callable[[], Awaitable[None]]
+
+
+class QueueFullError(Exception):
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class JobScheduler:
+    def __init__(self, workers: int, max_queued: int, max_queued_per_user: int, expected_job_seconds: float):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.max_queued_per_user = max_queued_per_user
+        self.running: Dict[str, asyncio.Task] = {}  # uuid -> task, for jobs that left the queue
+        self._queues: "OrderedDict[str, Deque[Tuple[str, JobFactory]]]" = OrderedDict()  # uid -> jobs, in round-robin order
+        self._queued: Dict[str, str] = {}  # uuid -> uid
+        self._avg_job_seconds = expected_job_seconds
+        self._wakeup = asyncio.Event()
+        self._worker_tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        self._wakeup = asyncio.Event()
+        self._worker_tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"[SCHEDULER] Started {self.workers} pipeline workers (queue size {self.max_queued})")
+
+    async def stop(self) -> None:
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    # Queue a job; returns its 1-based queue position or raises QueueFullError
+    def submit(self, uid: str, uuid: str, job: JobFactory) -> int:
+        if len(self._queued) >= self.max_queued:
+            raise QueueFullError("Server is busy, please retry later.", self.retry_after())
+        user_queue = self._queues.get(uid)
+        if user_queue is not None and len(user_queue) >= self.max_queued_per_user:
+            raise QueueFullError("Too many queued uploads for this user, please retry later.", self.retry_after())
+        if user_queue is None:
+            user_queue = self._queues[uid] = deque()
+        user_queue.append((uuid, job))
+        self._queued[uuid] = uid
+        self._wakeup.set()
+        return self.position(uuid)
+
+    # Drop a job that has not started yet; True if it was queued
+    def cancel(self, uuid: str) -> bool:
+        uid = self._queued.pop(uuid, None)
+        if uid is None:
+            return False
+        user_queue = self._queues[uid]
+        for item in user_queue:
+            if item[0] == uuid:
+                user_queue.remove(item)
+                break
+        if not user_queue:
+            del self._queues[uid]
+        return True
+
+    def queued_uuids(self) -> List[str]:
+        return list(self._queued)
+
+    def queued_count(self) -> int:
+        return len(self._queued)
+
+    # 1-based position in dequeue order (round-robin across users), None when not queued
+    def position(self, uuid: str) -> Optional[int]:
+        uid = self._queued.get(uuid)
+        if uid is None:
+            return None
+        uids = list(self._queues)
+        index = next(i for i, job in enumerate(self._queues[uid]) if job[0] == uuid)
+        user_index = uids.index(uid)
+        # Every user ahead of us in the rotation gets one slot per round, up to `index` rounds
+        ahead = 0
+        for i, other in enumerate(uids):
+            rounds = index + 1 if i < user_index else index
+            ahead += min(len(self._queues[other]), rounds)
+        return ahead + 1
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil((len(self._queued) / max(self.workers, 1) + 1) * self._avg_job_seconds))
+
+    def _pop_next(self) -> Optional[Tuple[str, JobFactory]]:
+        if not self._queues:
+            return None
+        uid, user_queue = next(iter(self._queues.items()))
+        uuid, job = user_queue.popleft()
+        del self._queues[uid]
+        if user_queue:
+            self._queues[uid] = user_queue  # rotate this user to the back
+        self._queued.pop(uuid, None)
+        return uuid, job
+
+    async def _worker(self, worker_id: int) -> None:
+        while True:
+            item = self._pop_next()
+            if item is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            uuid, job = item
+            start = time.monotonic()
+            task = asyncio.create_task(job())
+            self.running[uuid] = task
+            try:
+                await asyncio.wait({task})
+            except asyncio.CancelledError:
+                task.cancel()
+                raise
+            finally:
+                if self.running.get(uuid) is task:
+                    del self.running[uuid]
+            if not task.cancelled() and task.exception() is not None:
+                logger.error(f"[SCHEDULER] Job {uuid} failed on worker {worker_id}: {task.exception()}")
+            # Moving average of job duration feeds the Retry-After estimate
+            self._avg_job_seconds = 0.8 * self._avg_job_seconds + 0.2 * (time.monotonic() - start)
+
+
+def build_scheduler() -> JobScheduler:
+    return JobScheduler(PIPELINE_WORKERS, PIPELINE_QUEUE_SIZE, PIPELINE_QUEUE_PER_USER, PIPELINE_EXPECTED_JOB_SECONDS)
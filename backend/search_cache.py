@@ -0,0 +1,114 @@
+import copy
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from chunking import STOPWORDS
+
+logger = logging.getLogger(__name__)
+
+# Cache of Tavily results per search query, shared across uploads. Queries are normalised to a
+# set of lowercase tokens (order, case, punctuation and stopwords ignored); a query that misses
+# exactly can still reuse the results of a cached query whose token set is similar enough
+# (Jaccard similarity over an inverted token index).
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "5000"))
+SEARCH_CACHE_TTL_SECONDS = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", str(24 * 3600)))
+SEARCH_CACHE_SIMILARITY = float(os.getenv("SEARCH_CACHE_SIMILARITY", "0.75"))
+SEARCH_CACHE_MAX_CANDIDATES = 200  # near-duplicate candidates scored per lookup
+
+QUERY_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#]*")
+TRACKING_PARAMS = frozenset(("ref", "fbclid", "gclid"))
+
+
+def normalize_query(topic_name: str, keywords: List[str]) -> Tuple[str, FrozenSet[str]]:
+    text = f"{topic_name} {' '.join(keywords)}".lower()
+    tokens = frozenset(token for token in QUERY_TOKEN_RE.findall(text) if token not in STOPWORDS)
+    return " ".join(sorted(tokens)), tokens
+
+
+# Canonical form of a result URL for de-duplication across topics
+def normalize_url(url: str) -> str:
+    parts = urlsplit((url or "").strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = urlencode(sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS
+    ))
+    return urlunsplit((parts.scheme.lower() or "https", host, parts.path.rstrip("/"), query, ""))
+
+
+class SearchCache:
+    def __init__(self, max_entries: int, ttl_seconds: float, similarity: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity = similarity
+        self._entries: "OrderedDict[str, Tuple[float, FrozenSet[str], List[Dict]]]" = OrderedDict()
+        self._index: Dict[str, Set[str]] = {}  # token -> keys of cached queries containing it
+        self._lock = threading.Lock()
+
+    # Results for the query, an exact match first, then the most similar cached query
+    def get(self, key: str, tokens: FrozenSet[str]) -> Optional[List[Dict]]:
+        if self.max_entries <= 0:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                self._remove(key)
+                entry = None
+            if entry is None and self.similarity < 1:
+                key = self._most_similar(tokens, now)
+                entry = self._entries.get(key) if key else None
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return copy.deepcopy(entry[2])
+
+    def set(self, key: str, tokens: FrozenSet[str], results: List[Dict]) -> None:
+        if self.max_entries <= 0 or not tokens:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.time() + self.ttl_seconds, tokens, copy.deepcopy(results))
+            for token in tokens:
+                self._index.setdefault(token, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def _most_similar(self, tokens: FrozenSet[str], now: float) -> Optional[str]:
+        # Any query with Jaccard >= threshold shares at least one token, so the index finds it
+        overlap: Dict[str, int] = {}
+        for token in tokens:
+            for key in self._index.get(token, ()):
+                overlap[key] = overlap.get(key, 0) + 1
+        candidates = sorted(overlap, key=overlap.get, reverse=True)[:SEARCH_CACHE_MAX_CANDIDATES]
+        best_key, best_score = None, self.similarity
+        for key in candidates:
+            expires_at, cached_tokens, _ = self._entries[key]
+            if expires_at <= now:
+                continue
+            score = overlap[key] / len(tokens | cached_tokens)
+            if score >= best_score:
+                best_key, best_score = key, score
+        return best_key
+
+    def _remove(self, key: str) -> None:
+        _, tokens, _ = self._entries.pop(key)
+        for token in tokens:
+            keys = self._index.get(token)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._index[token]
+
+
+def build_search_cache() -> SearchCache:
+    return SearchCache(SEARCH_CACHE_MAX_ENTRIES, SEARCH_CACHE_TTL_SECONDS, SEARCH_CACHE_SIMILARITY)
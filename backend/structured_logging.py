@@ -0,0 +1,171 @@
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from metrics import LOG_RECORDS_DROPPED
+
+# Non-blocking structured logging. Handlers on the request path only put the record on a bounded
+# queue; a listener thread formats it as one JSON object per line and writes it out. Records are
+# dropped (and counted) rather than blocking when the queue is full. Long messages and fields are
+# truncated, and large INFO/DEBUG records are sampled. Job UUID and pipeline stage come from a
+# context variable, so every record logged while a job runs carries them.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()  # json | text
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_MAX_MESSAGE_CHARS = int(os.getenv("LOG_MAX_MESSAGE_CHARS", "2000"))
+LOG_MAX_FIELD_CHARS = int(os.getenv("LOG_MAX_FIELD_CHARS", "1000"))
+LOG_LARGE_RECORD_CHARS = int(os.getenv("LOG_LARGE_RECORD_CHARS", "1000"))
+LOG_LARGE_RECORD_SAMPLE_RATE = float(os.getenv("LOG_LARGE_RECORD_SAMPLE_RATE", "0.1"))
+
+# Fields every LogRecord has; anything else on a record came in through `extra`
+STANDARD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+log_context: contextvars.ContextVar[Dict[str, str]] = contextvars.ContextVar("log_context", default={})
+
+
+# Add fields (e.g. uuid, stage) to every record logged from the current context (task)
+def bind_log_context(**fields) -> None:
+    log_context.set({**log_context.get(), **fields})
+
+
+def truncate(value: str, limit: int) -> str:
+    if len(value) <= limit:
+        return value
+    return f"{value[:limit]}... [{len(value) - limit} chars truncated]"
+
+
+# A snapshot of an `extra` field that is safe to format later on another thread: scalars as they
+# are, containers as a JSON copy when small enough, otherwise a truncated JSON string
+def field_value(value):
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, str):
+        return truncate(value, LOG_MAX_FIELD_CHARS)
+    try:
+        serialized = json.dumps(value, default=str)
+    except (TypeError, ValueError):
+        serialized = str(value)
+    if len(serialized) <= LOG_MAX_FIELD_CHARS:
+        return json.loads(serialized) if serialized[:1] in "[{" else serialized
+    return truncate(serialized, LOG_MAX_FIELD_CHARS)
+
+
+# Runs in the caller's thread, where the context variable is visible: samples large low-level
+# records and attaches the context fields
+class ContextFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING and LOG_LARGE_RECORD_SAMPLE_RATE < 1:
+            if len(str(record.msg)) > LOG_LARGE_RECORD_CHARS and random.random() >= LOG_LARGE_RECORD_SAMPLE_RATE:
+                return False
+        for key, value in log_context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    # Render and truncate the message here so the queued record holds no large objects
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.message = truncate(record.getMessage(), LOG_MAX_MESSAGE_CHARS)
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg, record.args, record.exc_info = record.message, None, None
+        for key, value in list(vars(record).items()):
+            if key not in STANDARD_ATTRIBUTES:
+                setattr(record, key, field_value(value))
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "severity": record.levelname,
+            "logger": record.name,
+            "message": record.msg,
+        }
+        for key, value in vars(record).items():
+            if key not in STANDARD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+# Route the root logger through the queue; idempotent
+def setup_logging() -> None:
+    global _listener
+    if _listener is not None:
+        return
+    output = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    records: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    handler = NonBlockingQueueHandler(records)
+    handler.addFilter(ContextFilter())
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(LOG_LEVEL)
+    # uvicorn installs its own synchronous handlers before the app is imported
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers.clear()
+        uvicorn_logger.propagate = True
+    _listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+# Flush queued records and stop the listener thread
+def stop_logging() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+# Per-key token buckets (requests per minute with a burst) for client-originated log events
+class KeyedRateLimiter:
+    def __init__(self, per_minute: float, burst: int, max_keys: int = 10000):
+        self.rate = per_minute / 60
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()  # key -> [tokens, updated]
+        self._lock = threading.Lock()
+
+    def allow(self, key: str) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.pop(key, None) or [float(self.burst), now]
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            allowed = bucket[0] >= 1
+            if allowed:
+                bucket[0] -= 1
+            self._buckets[key] = bucket
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return allowed
@@ -0,0 +1,50 @@
+# The extraction process pool: a call that overruns its timeout recycles the pool, and calls
+# caught in the recycled pool are retried on the new one.
+#
+#   cd backend && python -m pytest -q tests
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import extraction  # noqa: E402
+from extraction import ExtractionTimeout, run_in_process  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def fresh_pool():
+    extraction.shutdown_process_pool()
+    yield
+    extraction.shutdown_process_pool()
+
+
+def test_hung_call_times_out_and_recycles_the_pool():
+    async def scenario():
+        assert await run_in_process(len, "warm") == 4
+        hung_pool = extraction.get_process_pool()
+        started = time.monotonic()
+        with pytest.raises(ExtractionTimeout):
+            await run_in_process(time.sleep, 60, timeout=1)
+        assert time.monotonic() - started < 10
+        assert extraction.get_process_pool() is not hung_pool
+        assert await run_in_process(len, "fresh") == 5
+
+    asyncio.run(scenario())
+
+
+def test_calls_caught_in_a_recycled_pool_are_retried(caplog):
+    async def scenario():
+        hung = asyncio.ensure_future(run_in_process(time.sleep, 60, timeout=1))
+        await asyncio.sleep(0.5)
+        # Still running or queued on the same pool when it is recycled
+        bystanders = [asyncio.ensure_future(run_in_process(time.sleep, 1.5)) for _ in range(extraction.EXTRACTION_PROCESSES)]
+        with pytest.raises(ExtractionTimeout):
+            await hung
+        assert await asyncio.gather(*bystanders) == [None] * len(bystanders)
+
+    asyncio.run(scenario())
+    assert sum("retrying" in record.getMessage() for record in caplog.records) == extraction.EXTRACTION_PROCESSES
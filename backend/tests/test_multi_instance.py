@@ -0,0 +1,201 @@
+# Two app instances (as two uvicorn workers would be) sharing one SQLite job store, against the
+# local fakes from bench.fakes. Both apps run on one background event loop; tests submit
+# coroutines to it.
+#
+#   cd backend && python -m pytest -q tests
+import asyncio
+import contextlib
+import importlib.util
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from bench.fakes import FakeConfig, TavilyStubServer, install_fakes  # noqa: E402
+from bench.pdfgen import make_document  # noqa: E402
+
+FINISHED = ("done", "failed", "cancelled")
+UID = "user-1"
+HEADERS = {"x-firebase-token": UID}  # the fakes accept any token; the uid is the token
+
+
+def load_app(name: str):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(BACKEND_DIR, "main.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class Instances:
+    def __init__(self, config: FakeConfig):
+        self.config = config
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.a = self.b = None
+        self._stack = None
+
+    def run(self, coro, timeout: float = 60):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    async def _start(self):
+        self._stack = contextlib.AsyncExitStack()
+        self.a, self.b = load_app("main_instance_a"), load_app("main_instance_b")
+        self.clients = {}
+        for instance in (self.a, self.b):
+            await self._stack.enter_async_context(instance.app.router.lifespan_context(instance.app))
+            transport = httpx.ASGITransport(app=instance.app)
+            client = httpx.AsyncClient(transport=transport, base_url="http://test", headers=HEADERS)
+            self.clients[instance] = await self._stack.enter_async_context(client)
+
+    def start(self):
+        self.thread.start()
+        self.run(self._start())
+
+    def stop(self):
+        self.run(self._stack.aclose())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(5)
+
+    def client(self, instance):
+        return self.clients[instance]
+
+
+@pytest.fixture(scope="module")
+def instances():
+    config = FakeConfig(gcs_latency=0.01, docai_latency=0.1, groq_latency=0.1, tavily_latency=0.02)
+    tavily = TavilyStubServer(config).start()
+    workdir = tempfile.mkdtemp(prefix="multi-instance-")
+    os.environ.update({
+        "GOOGLE_CLOUD_PROJECT": "test-project",
+        "DOCUMENT_AI_PROCESSOR_ID": "test-processor",
+        "GCS_BUCKET_NAME": "test-bucket",
+        "GROQ_API_KEY": "test",
+        "TAVILY_API_KEY": "test",
+        "TAVILY_API_URL": tavily.url,
+        "JOB_STORE_BACKEND": "sqlite",
+        "JOB_STORE_PATH": os.path.join(workdir, "jobs.sqlite3"),
+        "JOB_CANCEL_POLL_SECONDS": "0.05",
+        "RESULT_CACHE_BACKEND": "none",
+        "SEARCH_CACHE_MAX_ENTRIES": "0",
+        "ARTIFACT_STORE_PATH": os.path.join(workdir, "artifacts"),
+        "DOCUMENT_AI_BATCH_WINDOW_SECONDS": "0.01",
+        "LOG_LEVEL": "WARNING",
+    })
+    for provider in ("GCS", "DOCUMENT_AI", "GROQ", "TAVILY"):
+        os.environ[f"{provider}_RATE_LIMIT_PER_MINUTE"] = "0"
+    install_fakes(config)
+    instances = Instances(config)
+    instances.start()
+    yield instances
+    instances.stop()
+    tavily.stop()
+
+
+async def upload(client, uuid: str, content: bytes, content_type: str = "application/pdf"):
+    return await client.post(
+        "/api/analyze-pdf", files={"file": ("doc.pdf", content, content_type)}, data={"uuid": uuid}
+    )
+
+
+async def status(client, uuid: str) -> dict:
+    response = await client.get(f"/api/analyze-pdf-status/{uuid}")
+    assert response.status_code == 200
+    return response.json()
+
+
+async def wait_for(client, uuid: str, statuses, timeout: float = 30) -> dict:
+    deadline = time.monotonic() + timeout
+    while True:
+        state = await status(client, uuid)
+        if state.get("status") in statuses or time.monotonic() > deadline:
+            return state
+        await asyncio.sleep(0.05)
+
+
+def test_status_of_a_job_running_on_the_other_instance(instances):
+    async def scenario():
+        response = await upload(instances.client(instances.a), "job-status", make_document(1, 4, 1))
+        assert response.status_code == 200
+        assert "job-status" in instances.a.running_tasks or instances.a.scheduler.queued_count()
+        assert "job-status" not in instances.b.running_tasks
+        state = await wait_for(instances.client(instances.b), "job-status", FINISHED)
+        assert state["status"] == "done"
+        assert state["result"]["analysis"]["pages"] == 4
+        assert state == await status(instances.client(instances.a), "job-status")
+
+    instances.run(scenario())
+
+
+def test_halt_on_one_instance_cancels_the_job_on_the_other(instances):
+    async def scenario():
+        instances.config.docai_latency = 5.0
+        try:
+            response = await upload(instances.client(instances.a), "job-halt", make_document(2, 3, 3))
+            assert response.status_code == 200
+            state = await wait_for(instances.client(instances.b), "job-halt", ("processing",) + FINISHED)
+            assert state["status"] == "processing"
+
+            response = await instances.client(instances.b).post("/api/halt_pdf_process", json={"uuid": "job-halt"})
+            assert response.json()["success"] is True
+            deadline = time.monotonic() + 5
+            while "job-halt" in instances.a.running_tasks and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+            assert "job-halt" not in instances.a.running_tasks
+            for instance in (instances.a, instances.b):
+                assert (await status(instances.client(instance), "job-halt"))["status"] == "cancelled"
+        finally:
+            instances.config.docai_latency = 0.1
+
+    instances.run(scenario())
+
+
+def test_rejected_upload_leaves_no_job_state(instances):
+    async def scenario():
+        response = await upload(instances.client(instances.a), "job-text", b"not a pdf", "text/plain")
+        assert response.status_code == 400
+        for instance in (instances.a, instances.b):
+            assert (await status(instances.client(instance), "job-text"))["status"] == "not_found"
+
+    instances.run(scenario())
+
+
+def test_unfinished_jobs_expire_for_every_instance(instances):
+    # Stores of both instances over the same file: state a crashed worker left behind is evicted
+    shared = instances.a.job_store.store
+    store_a = type(shared)(shared.path, 60, 0.05)
+    store_b = type(shared)(instances.b.job_store.store.path, 60, 0.05)
+    store_a.set("job-orphan", {"status": "processing", "result": None, "error": None})
+    assert store_b.get("job-orphan")["status"] == "processing"
+    time.sleep(0.1)
+    assert store_b.evict_expired() >= 1
+    assert store_a.get("job-orphan") is None
+
+
+def test_jobs_are_only_visible_to_their_owner(instances):
+    async def scenario():
+        response = await upload(instances.client(instances.a), "job-owned", make_document(3, 2, 0))
+        assert response.status_code == 200
+        assert (await wait_for(instances.client(instances.a), "job-owned", FINISHED))["status"] == "done"
+        other = {"x-firebase-token": "user-2"}
+        client = instances.client(instances.b)
+        for path in ("/api/analyze-pdf-status/job-owned", "/api/analyze-pdf-text/job-owned",
+                     "/api/analyze-pdf-document/job-owned", "/api/analyze-pdf-stream/job-owned"):
+            assert (await client.get(path, headers=other)).status_code == 403
+        response = await client.post("/api/halt_pdf_process", json={"uuid": "job-owned"}, headers=other)
+        assert response.status_code == 403
+        response = await client.request("DELETE", "/api/delete-pdf", json={"uuid": "job-owned", "filename": "doc.pdf"},
+                                        headers=other)
+        assert response.status_code == 403
+        response = await client.post("/api/analyze-pdf", files={"file": ("doc.pdf", make_document(4, 1, 0), "application/pdf")},
+                                     data={"uuid": "job-owned"}, headers=other)
+        assert response.status_code == 403
+        assert (await status(client, "job-owned"))["status"] == "done"
+
+    instances.run(scenario())
@@ -0,0 +1,241 @@
+# FirebaseTokenVerifier and PublicKeyCache against a locally generated signing key: tokens are
+# signed with RS256 here and the certificate is served through a patched httpx.get.
+#
+#   cd backend && python -m pytest -q tests
+import base64
+import datetime
+import hashlib
+import hmac
+import json
+import os
+import sys
+import time
+
+import httpx
+import jwt
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import token_auth  # noqa: E402
+from token_auth import FirebaseTokenVerifier, InvalidToken, PublicKeyCache  # noqa: E402
+
+PROJECT = "test-project"
+ISSUER = f"https://securetoken.google.com/{PROJECT}"
+KID = "key-1"
+
+
+def make_signing_key():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "securetoken.test")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    return key, cert.public_bytes(serialization.Encoding.PEM).decode("utf-8")
+
+
+PRIVATE_KEY, CERT_PEM = make_signing_key()
+
+
+def claims(**overrides) -> dict:
+    now = int(time.time())
+    payload = {"iss": ISSUER, "aud": PROJECT, "sub": "user-1", "iat": now, "exp": now + 3600, "auth_time": now}
+    payload.update(overrides)
+    return {name: value for name, value in payload.items() if value is not None}
+
+
+def sign(payload: dict, kid: str = KID) -> str:
+    return jwt.encode(payload, PRIVATE_KEY, algorithm="RS256", headers={"kid": kid})
+
+
+def b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+# Offsets token_auth's view of the clock; jwt itself keeps the real time
+class Clock:
+    def __init__(self):
+        self.offset = 0.0
+
+    def time(self) -> float:
+        return time.time() + self.offset
+
+    def monotonic(self) -> float:
+        return time.monotonic() + self.offset
+
+
+class CertServer:
+    def __init__(self):
+        self.certs = {KID: CERT_PEM}
+        self.headers = {"cache-control": "public, max-age=3600"}
+        self.fetches = 0
+
+    def get(self, url, timeout=None):
+        self.fetches += 1
+        return httpx.Response(200, json=self.certs, headers=self.headers, request=httpx.Request("GET", url))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(token_auth, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def certs(monkeypatch):
+    server = CertServer()
+    monkeypatch.setattr(token_auth.httpx, "get", server.get)
+    return server
+
+
+@pytest.fixture
+def verifier(clock, certs):
+    return FirebaseTokenVerifier(PROJECT, PublicKeyCache("https://certs.test/"))
+
+
+def test_valid_token(verifier):
+    assert verifier.verify(sign(claims())) == "user-1"
+
+
+@pytest.mark.parametrize("overrides", [
+    {"aud": "other-project"},
+    {"iss": "https://securetoken.google.com/other-project"},
+    {"iss": "https://accounts.google.com"},
+])
+def test_wrong_audience_or_issuer(verifier, overrides):
+    with pytest.raises(InvalidToken):
+        verifier.verify(sign(claims(**overrides)))
+
+
+def test_expired_token(verifier):
+    now = int(time.time())
+    with pytest.raises(InvalidToken):
+        verifier.verify(sign(claims(iat=now - 7200, exp=now - 3600)))
+
+
+def test_auth_time_in_the_future(verifier):
+    with pytest.raises(InvalidToken, match="auth_time"):
+        verifier.verify(sign(claims(auth_time=int(time.time()) + 3600)))
+
+
+@pytest.mark.parametrize("sub", [None, "", "x" * 129])
+def test_missing_or_invalid_subject(verifier, sub):
+    with pytest.raises(InvalidToken):
+        verifier.verify(sign(claims(sub=sub)))
+
+
+def test_unknown_key_id_refetch_is_throttled(verifier, clock, certs):
+    assert verifier.verify(sign(claims())) == "user-1"
+    assert certs.fetches == 1
+
+    # An unknown key id refetches, but only once per AUTH_CERTS_MIN_REFRESH_SECONDS
+    clock.offset += token_auth.AUTH_CERTS_MIN_REFRESH_SECONDS
+    with pytest.raises(InvalidToken, match="unknown key"):
+        verifier.verify(sign(claims(), kid="key-2"))
+    assert certs.fetches == 2
+    with pytest.raises(InvalidToken, match="unknown key"):
+        verifier.verify(sign(claims(sub="user-2"), kid="key-2"))
+    assert certs.fetches == 2
+
+    # Rotated in: picked up by the next refetch the throttle allows
+    certs.certs["key-2"] = CERT_PEM
+    clock.offset += token_auth.AUTH_CERTS_MIN_REFRESH_SECONDS
+    assert verifier.verify(sign(claims(sub="user-3"), kid="key-2")) == "user-3"
+    assert certs.fetches == 3
+
+
+def test_none_algorithm_is_rejected(verifier):
+    token = jwt.encode(claims(), None, algorithm="none", headers={"kid": KID})
+    with pytest.raises(InvalidToken):
+        verifier.verify(token)
+
+
+def test_hs256_signed_with_the_public_certificate_is_rejected(verifier):
+    # Algorithm confusion: an HMAC signature keyed with the (public) certificate
+    header = b64(json.dumps({"alg": "HS256", "typ": "JWT", "kid": KID}).encode("utf-8"))
+    payload = b64(json.dumps(claims()).encode("utf-8"))
+    signature = hmac.new(CERT_PEM.encode("utf-8"), f"{header}.{payload}".encode("ascii"), hashlib.sha256).digest()
+    with pytest.raises(InvalidToken):
+        verifier.verify(f"{header}.{payload}.{b64(signature)}")
+
+
+def test_rs256_header_with_a_forged_signature_is_rejected(verifier):
+    other_key, _ = make_signing_key()
+    token = jwt.encode(claims(), other_key, algorithm="RS256", headers={"kid": KID})
+    with pytest.raises(InvalidToken):
+        verifier.verify(token)
+
+
+def test_verified_token_cache_hit_then_expiry(verifier, clock, monkeypatch):
+    decoded = []
+    decode = verifier.decode
+    monkeypatch.setattr(verifier, "decode", lambda token: decoded.append(token) or decode(token))
+    token = sign(claims(exp=int(time.time()) + 600))
+
+    assert verifier.cached_uid(token) is None
+    assert verifier.verify(token) == "user-1"
+    assert verifier.cached_uid(token) == "user-1"
+    assert verifier.verify(token) == "user-1"
+    assert len(decoded) == 1
+
+    # Once the token's exp has passed the cached entry is dropped and the token is checked again
+    clock.offset += 601
+    assert verifier.cached_uid(token) is None
+    verifier.verify(token)
+    assert len(decoded) == 2
+
+
+def test_verified_token_cache_is_bounded(clock, certs):
+    verifier = FirebaseTokenVerifier(PROJECT, PublicKeyCache("https://certs.test/"), cache_size=2)
+    tokens = [sign(claims(sub=f"user-{i}")) for i in range(3)]
+    for token in tokens:
+        verifier.verify(token)
+    assert verifier.cached_uid(tokens[0]) is None
+    assert [verifier.cached_uid(token) for token in tokens[1:]] == ["user-1", "user-2"]
+
+
+def test_max_age_subtracts_age():
+    assert token_auth._max_age(httpx.Headers({"cache-control": "public, max-age=3600", "age": "600"})) == 3000
+    assert token_auth._max_age(httpx.Headers({"cache-control": "max-age=100", "age": "250"})) == 0
+    assert token_auth._max_age(httpx.Headers({"cache-control": "max-age=100", "age": "junk"})) == 100
+    assert token_auth._max_age(httpx.Headers({})) == token_auth.AUTH_CERTS_DEFAULT_MAX_AGE
+
+
+def test_keys_are_refetched_when_max_age_minus_age_runs_out(clock, certs):
+    certs.headers = {"cache-control": "public, max-age=100", "age": "40"}
+    keys = PublicKeyCache("https://certs.test/")
+    keys.get(KID)
+    assert certs.fetches == 1
+    clock.offset += 59
+    keys.get(KID)
+    assert certs.fetches == 1
+    clock.offset += 2
+    keys.get(KID)
+    assert certs.fetches == 2
+
+
+def test_failed_refresh_keeps_the_cached_keys(clock, certs, monkeypatch):
+    keys = PublicKeyCache("https://certs.test/")
+    keys.get(KID)
+
+    def unavailable(url, timeout=None):
+        return httpx.Response(503, request=httpx.Request("GET", url))
+
+    monkeypatch.setattr(token_auth.httpx, "get", unavailable)
+    clock.offset += token_auth.AUTH_CERTS_DEFAULT_MAX_AGE + 1
+    assert keys.get(KID) is not None
+    with pytest.raises(InvalidToken):
+        PublicKeyCache("https://certs.test/").get(KID)
@@ -0,0 +1,142 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import httpx
+import jwt
+from cryptography.x509 import load_pem_x509_certificate
+
+logger = logging.getLogger(__name__)
+
+# Local verification of Firebase ID tokens. Google's signing certificates are fetched once and
+# kept for as long as their Cache-Control header allows; tokens that were already verified are
+# remembered (by SHA-256 of the token) until they expire, so repeat requests skip the RSA check.
+FIREBASE_CERTS_URL = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))
+AUTH_CLOCK_SKEW_SECONDS = int(os.getenv("AUTH_CLOCK_SKEW_SECONDS", "10"))
+AUTH_CERTS_DEFAULT_MAX_AGE = 3600
+AUTH_CERTS_MIN_REFRESH_SECONDS = 30  # refetch for an unknown key id at most this often
+
+
+class InvalidToken(Exception):
+    pass
+
+
+def _max_age(headers: httpx.Headers) -> int:
+    match = re.search(r"max-age=(\d+)", headers.get("cache-control", ""))
+    if not match:
+        return AUTH_CERTS_DEFAULT_MAX_AGE
+    age = headers.get("age", "0")
+    return max(0, int(match.group(1)) - (int(age) if age.isdigit() else 0))
+
+
+# Signing keys by key id, refreshed when the cached set expires or an unknown key id shows up
+class PublicKeyCache:
+    def __init__(self, url: str = FIREBASE_CERTS_URL):
+        self.url = url
+        self._keys: Dict[str, object] = {}
+        self._expires_at = 0.0
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+
+    def _refresh(self) -> None:
+        response = httpx.get(self.url, timeout=10)
+        response.raise_for_status()
+        self._keys = {
+            kid: load_pem_x509_certificate(pem.encode("utf-8")).public_key()
+            for kid, pem in response.json().items()
+        }
+        self._fetched_at = time.monotonic()
+        self._expires_at = self._fetched_at + _max_age(response.headers)
+        logger.info(f"[AUTH] Loaded {len(self._keys)} signing keys, cached for {int(self._expires_at - self._fetched_at)}s")
+
+    # Blocking: may fetch the certificates
+    def get(self, kid: str):
+        with self._lock:
+            now = time.monotonic()
+            stale = now >= self._expires_at
+            unknown = kid not in self._keys and now - self._fetched_at >= AUTH_CERTS_MIN_REFRESH_SECONDS
+            if stale or unknown:
+                try:
+                    self._refresh()
+                except Exception as e:
+                    if not self._keys:
+                        raise InvalidToken(f"Could not load signing keys: {e}")
+                    logger.warning(f"[AUTH] Signing key refresh failed, using cached keys: {e}")
+            key = self._keys.get(kid)
+        if key is None:
+            raise InvalidToken("Token signed with an unknown key")
+        return key
+
+
+class FirebaseTokenVerifier:
+    def __init__(self, project_id: str, keys: PublicKeyCache, cache_size: int = AUTH_TOKEN_CACHE_SIZE,
+                 clock_skew: int = AUTH_CLOCK_SKEW_SECONDS):
+        self.project_id = project_id
+        self.keys = keys
+        self.cache_size = cache_size
+        self.clock_skew = clock_skew
+        self._verified: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()  # token sha256 -> (uid, exp)
+        self._lock = threading.Lock()
+
+    # UID for a token verified earlier and not yet expired; cheap enough for the event loop
+    def cached_uid(self, token: str) -> Optional[str]:
+        digest = hashlib.sha256(token.encode("utf-8")).hexdigest()
+        with self._lock:
+            entry = self._verified.get(digest)
+            if entry is None:
+                return None
+            uid, expires = entry
+            if time.time() >= expires:
+                del self._verified[digest]
+                return None
+            self._verified.move_to_end(digest)
+            return uid
+
+    # Blocking: full signature and claims check, then remember the token until it expires
+    def verify(self, token: str) -> str:
+        uid = self.cached_uid(token)
+        if uid is not None:
+            return uid
+        claims = self.decode(token)
+        digest = hashlib.sha256(token.encode("utf-8")).hexdigest()
+        with self._lock:
+            self._verified[digest] = (claims["sub"], float(claims["exp"]))
+            while len(self._verified) > self.cache_size:
+                self._verified.popitem(last=False)
+        return claims["sub"]
+
+    def decode(self, token: str) -> dict:
+        try:
+            header = jwt.get_unverified_header(token)
+        except jwt.PyJWTError as e:
+            raise InvalidToken(f"Malformed token: {e}")
+        if header.get("alg") != "RS256" or not header.get("kid"):
+            raise InvalidToken("Unexpected token header")
+        key = self.keys.get(header["kid"])
+        try:
+            claims = jwt.decode(
+                token,
+                key,
+                algorithms=["RS256"],
+                audience=self.project_id,
+                issuer=f"https://securetoken.google.com/{self.project_id}",
+                leeway=self.clock_skew,
+                options={"require": ["exp", "iat", "sub", "aud", "iss"]},
+            )
+        except jwt.PyJWTError as e:
+            raise InvalidToken(str(e))
+        if not claims["sub"] or len(claims["sub"]) > 128:
+            raise InvalidToken("Invalid subject")
+        if claims.get("auth_time", 0) > time.time() + self.clock_skew:
+            raise InvalidToken("Token auth_time is in the future")
+        return claims
+
+
+def build_token_verifier(project_id: str) -> FirebaseTokenVerifier:
+    return FirebaseTokenVerifier(project_id, PublicKeyCache())
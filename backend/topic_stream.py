@@ -0,0 +1,113 @@
+import json
+import re
+from typing import Dict, List, Optional
+
+# Incremental parser for the LLM's {"topics": [...]} reply. Text is fed as it streams in; each
+# topic object is returned as soon as its closing brace arrives, so downstream work can start
+# before the rest of the reply is generated. Surrounding prose or ``` fences are ignored.
+TOPICS_ARRAY_RE = re.compile(r'"topics"\s*:\s*\[')
+
+
+class TopicParseError(Exception):
+    pass
+
+
+def valid_topic(topic) -> bool:
+    return (
+        isinstance(topic, dict)
+        and isinstance(topic.get("name"), str) and topic["name"].strip() != ""
+        and isinstance(topic.get("keywords"), list)
+        and all(isinstance(keyword, str) for keyword in topic["keywords"])
+    )
+
+
+class TopicStreamParser:
+    def __init__(self, max_topics: Optional[int] = None):
+        self.max_topics = max_topics
+        self.text = ""
+        self.topics: List[Dict] = []
+        self.closed = False  # the topics array has ended
+        self.error: Optional[TopicParseError] = None
+        self._pos: Optional[int] = None  # scan position inside the array; None until "[" is seen
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._start = 0
+
+    # Add a chunk of the reply; returns the topics completed by it. A parse error is raised and
+    # also kept, so finish() raises it again.
+    def feed(self, chunk: str) -> List[Dict]:
+        try:
+            return self._feed(chunk)
+        except TopicParseError as e:
+            self.error = e
+            raise
+
+    def _feed(self, chunk: str) -> List[Dict]:
+        self.text += chunk
+        if self.closed or self.full():
+            return []
+        if self._pos is None:
+            match = TOPICS_ARRAY_RE.search(self.text)
+            if not match:
+                return []
+            self._pos = match.end()
+        completed = []
+        text = self.text
+        for i in range(self._pos, len(text)):
+            char = text[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 0:
+                    if char == "[":
+                        raise TopicParseError(f"Unexpected array in topics at offset {i}")
+                    self._start = i
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0:
+                    if char == "]":
+                        self.closed = True
+                        self._pos = i + 1
+                        return completed
+                    raise TopicParseError(f"Unbalanced '}}' in topics at offset {i}")
+                self._depth -= 1
+                if self._depth == 0:
+                    completed.append(self._topic(text[self._start:i + 1]))
+                    if self.full():
+                        self._pos = i + 1
+                        return completed
+        self._pos = len(text)
+        return completed
+
+    def full(self) -> bool:
+        return self.max_topics is not None and len(self.topics) >= self.max_topics
+
+    def _topic(self, raw: str) -> Dict:
+        try:
+            topic = json.loads(raw)
+        except json.JSONDecodeError as e:
+            raise TopicParseError(f"Invalid topic object: {e}")
+        if not valid_topic(topic):
+            raise TopicParseError(f"Topic is missing a name or keywords: {raw[:200]}")
+        self.topics.append(topic)
+        return topic
+
+    # Call once the stream has ended; raises if the reply did not contain a usable topics array
+    def finish(self) -> List[Dict]:
+        if self.error is not None:
+            raise self.error
+        if self._pos is None:
+            raise TopicParseError("No topics array in the reply")
+        if not (self.closed or self.full()):
+            raise TopicParseError("Reply ended before the topics array was closed")
+        if not self.topics:
+            raise TopicParseError("The topics array is empty")
+        return self.topics
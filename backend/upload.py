@@ -0,0 +1,175 @@
+import hashlib
+import logging
+import os
+import tempfile
+import weakref
+from typing import Dict, List, Optional
+
+from multipart.multipart import MultipartParser, parse_options_header
+from starlette.requests import Request
+
+from executor import run_blocking
+
+logger = logging.getLogger(__name__)
+
+# Streaming multipart ingest for PDF uploads. The request body is parsed as it arrives: the file
+# part is hashed and appended to a spool file on disk, the byte limit is enforced per chunk, and
+# only small form fields are kept in memory. Peak memory per upload is about UPLOAD_BUFFER_BYTES,
+# whatever the size limit.
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(5 * 1024 * 1024)))
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR") or os.path.join(tempfile.gettempdir(), "pdf-uploads")
+UPLOAD_BUFFER_BYTES = int(os.getenv("UPLOAD_BUFFER_BYTES", str(256 * 1024)))
+MAX_FORM_FIELD_BYTES = 4096
+MULTIPART_OVERHEAD_BYTES = 64 * 1024  # boundaries, part headers and small fields
+
+
+class UploadError(Exception):
+    pass
+
+
+class UploadTooLarge(UploadError):
+    pass
+
+
+# An upload spooled to disk. The spool file is removed by cleanup() or, failing that, when the
+# object is garbage collected (e.g. a queued job is dropped before it ever runs).
+class SpooledUpload:
+    def __init__(self, path: str):
+        self.path = path
+        self.size = 0
+        self.sha256 = ""
+        self.filename: Optional[str] = None
+        self.content_type: Optional[str] = None
+        self.fields: Dict[str, str] = {}
+        self._finalizer = weakref.finalize(self, _remove, path)
+
+    def read_bytes(self) -> bytes:
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def cleanup(self) -> None:
+        self._finalizer()
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"[UPLOAD] Could not remove spool file {path}: {e}")
+
+
+class _StreamingParser:
+    def __init__(self, upload: SpooledUpload, file_field: str, max_bytes: int):
+        self.upload = upload
+        self.file_field = file_field
+        self.max_bytes = max_bytes
+        self.hasher = hashlib.sha256()
+        self.pending: List[bytes] = []
+        self.pending_bytes = 0
+        self._header_name = b""
+        self._header_value = b""
+        self._disposition = b""
+        self._part_content_type = b""
+        self._field_name: Optional[str] = None
+        self._field_data = b""
+        self._in_file = False
+
+    def on_part_begin(self) -> None:
+        self._disposition = self._part_content_type = b""
+        self._field_name = None
+        self._field_data = b""
+        self._in_file = False
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        name = self._header_name.lower()
+        if name == b"content-disposition":
+            self._disposition = self._header_value
+        elif name == b"content-type":
+            self._part_content_type = self._header_value
+        self._header_name = self._header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._disposition)
+        if b"name" not in options:
+            raise UploadError('The Content-Disposition header field "name" must be provided.')
+        self._field_name = options[b"name"].decode("utf-8", "replace")
+        if b"filename" in options and self._field_name == self.file_field:
+            if self.upload.filename is not None:
+                raise UploadError("Only one file can be uploaded per request.")
+            self._in_file = True
+            self.upload.filename = options[b"filename"].decode("utf-8", "replace")
+            self.upload.content_type = self._part_content_type.decode("latin-1") or None
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        chunk = data[start:end]
+        if self._in_file:
+            self.upload.size += len(chunk)
+            if self.upload.size > self.max_bytes:
+                raise UploadTooLarge(f"Upload exceeds {self.max_bytes} bytes")
+            self.hasher.update(chunk)
+            self.pending.append(chunk)
+            self.pending_bytes += len(chunk)
+        elif self._field_name is not None:
+            self._field_data += chunk
+            if len(self._field_data) > MAX_FORM_FIELD_BYTES:
+                raise UploadError(f"Form field {self._field_name!r} is too large")
+
+    def on_part_end(self) -> None:
+        if not self._in_file and self._field_name is not None:
+            self.upload.fields[self._field_name] = self._field_data.decode("utf-8", "replace")
+
+    def take_pending(self) -> bytes:
+        data = b"".join(self.pending)
+        self.pending.clear()
+        self.pending_bytes = 0
+        return data
+
+
+# Parse a multipart/form-data request body, spooling the `file_field` part to disk.
+# Raises UploadTooLarge as soon as the file (or the declared Content-Length) exceeds max_bytes.
+async def receive_upload(request: Request, file_field: str = "file", max_bytes: int = MAX_UPLOAD_BYTES) -> SpooledUpload:
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes + MULTIPART_OVERHEAD_BYTES:
+        raise UploadTooLarge(f"Declared body of {content_length} bytes exceeds {max_bytes} bytes")
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise UploadError("Expected a multipart/form-data body")
+
+    os.makedirs(UPLOAD_SPOOL_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix="upload-", suffix=".pdf", dir=UPLOAD_SPOOL_DIR)
+    upload = SpooledUpload(path)
+    state = _StreamingParser(upload, file_field, max_bytes)
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": state.on_part_begin,
+        "on_part_data": state.on_part_data,
+        "on_part_end": state.on_part_end,
+        "on_header_field": state.on_header_field,
+        "on_header_value": state.on_header_value,
+        "on_header_end": state.on_header_end,
+        "on_headers_finished": state.on_headers_finished,
+    })
+    try:
+        with os.fdopen(fd, "wb") as spool:
+            async for chunk in request.stream():
+                parser.write(chunk)
+                if state.pending_bytes >= UPLOAD_BUFFER_BYTES:
+                    await run_blocking(spool.write, state.take_pending())
+            parser.finalize()
+            if state.pending_bytes:
+                await run_blocking(spool.write, state.take_pending())
+    except BaseException:
+        upload.cleanup()
+        raise
+    if upload.filename is None:
+        upload.cleanup()
+        raise UploadError(f"Missing file field {file_field!r}")
+    upload.sha256 = state.hasher.hexdigest()
+    return upload
@@ -3,6 +3,9 @@
 // Use logFrontendAction for all user action logging:
 //   logFrontendAction({ actionType: 'LOGIN ATTEMPT', component: 'LoginPage', details: { ... } })
 // This ensures all logs are consistently tagged as [FRONTEND ACTION] [ACTION_TYPE].
+// Signed-in users send their ID token, so the backend rate limits log events per user.
+
+import { auth } from "@/lib/firebase";
 
 export type UserActionLog = {
     action: string;
@@ -21,9 +24,14 @@ export type UserActionLog = {
       details,
     };
     try {
+      const headers: Record<string, string> = { "Content-Type": "application/json" };
+      const user = auth.currentUser;
+      if (user) {
+        headers["x-firebase-token"] = await user.getIdToken();
+      }
       await fetch("http://localhost:8000/api/log_user_action", {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
+        headers,
         body: JSON.stringify(log),
       });
     } catch (err) {